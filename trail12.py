@@ -1,16 +1,19 @@
 import os
 import sqlite3
-from datetime import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date
 from functools import wraps
-from io import StringIO
 import csv
 
 from flask import (
     Flask, render_template, request, redirect, url_for,
-    session, flash, Response
+    session, flash, Response, stream_with_context, g
 )
 from werkzeug.security import generate_password_hash, check_password_hash
 import qrcode
+import qrcode.image.pure
 
 # ----------------- Paths & Setup -----------------
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -23,18 +26,124 @@ os.makedirs(QRCODE_DIR, exist_ok=True)
 app = Flask(__name__)
 app.secret_key = "change_this_secret_key_very_long"
 
+# Password KDF and cost, chosen once. scrypt N=16384 is the usual cost for
+# interactive logins; raise it via PASSWORD_HASH_METHOD if login latency allows.
+# Existing hashes keep verifying because the method is stored in each hash.
+HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:16384:8:1")
+
+# Rows per page of the owner dashboard attendance table
+ATTENDANCE_PAGE_SIZE = 100
+
+# Seconds a rendered dashboard is reused before it is rendered again
+DASHBOARD_CACHE_TTL = 30
+
+
+# ----------------- SQL -----------------
+# Hot-path statements are kept as constants and run with conn.execute(), so
+# each one has a single SQL text the connection's statement cache can reuse.
+SQL_LOGIN_USER = "SELECT id, username, role, password_hash FROM users WHERE username=?"
+SQL_USER_BY_ID = "SELECT id, username, role FROM users WHERE id=?"
+SQL_FIND_OPEN_ATTENDANCE = """
+    SELECT id FROM attendance
+    WHERE user_id=? AND check_out IS NULL
+    ORDER BY check_in DESC LIMIT 1
+"""
+SQL_CHECK_IN = "INSERT INTO attendance (user_id, check_in) VALUES (?, ?)"
+SQL_CHECK_OUT = "UPDATE attendance SET check_out=? WHERE id=?"
+SQL_INSERT_MESSAGE = "INSERT INTO messages (to_user_id, title, body, created_at) VALUES (?, ?, ?, ?)"
+SQL_STAFF_PROFILE = "SELECT username, qr_filename FROM users WHERE id=?"
+SQL_STAFF_LOGS = """
+    SELECT check_in, check_out FROM attendance
+    WHERE user_id=? ORDER BY check_in DESC LIMIT 30
+"""
+SQL_STAFF_TODAY_STATUS = """
+    SELECT CASE WHEN EXISTS (
+      SELECT 1 FROM attendance
+      WHERE user_id=? AND check_in >= ? AND check_in <= ?
+    ) THEN 'Present' ELSE 'Absent' END AS today_status
+"""
+SQL_STAFF_MESSAGES = """
+    SELECT title, body, created_at FROM messages
+    WHERE to_user_id=? ORDER BY created_at DESC LIMIT 20
+"""
+
 
 # ----------------- DB Helpers -----------------
-def get_db():
-    conn = sqlite3.connect(DB_PATH)
+def _connect():
+    conn = sqlite3.connect(DB_PATH, cached_statements=512)
     conn.row_factory = sqlite3.Row
+    # These PRAGMAs are per-connection (journal_mode=WAL is persisted by init_db)
+    conn.execute("PRAGMA busy_timeout=30000")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=268435456")
+    conn.execute("PRAGMA cache_size=-20000")
+    conn.execute("PRAGMA foreign_keys=ON")
     return conn
 
 
+def get_db():
+    """One connection per request, reused by every helper and closed in close_db()."""
+    if "db" not in g:
+        g.db = _connect()
+    return g.db
+
+
+@app.teardown_appcontext
+def close_db(exc):
+    db = g.pop("db", None)
+    if db is not None:
+        db.close()
+
+
+# Child tables cascade when their user is deleted. {name} lets
+# _ensure_cascade() build a replacement table under a temporary name.
+ATTENDANCE_DDL = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        check_in TEXT NOT NULL,
+        check_out TEXT,
+        FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+    )
+"""
+
+MESSAGES_DDL = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        to_user_id INTEGER NOT NULL,
+        title TEXT,
+        body TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        FOREIGN KEY(to_user_id) REFERENCES users(id) ON DELETE CASCADE
+    )
+"""
+
+
+def _ensure_cascade(conn, table, ddl, columns):
+    """Rebuild a table created before ON DELETE CASCADE (SQLite can't ALTER a foreign key)."""
+    fks = conn.execute(f"PRAGMA foreign_key_list({table})").fetchall()
+    if all(fk["on_delete"] == "CASCADE" for fk in fks):
+        return
+    conn.executescript(f"""
+        PRAGMA foreign_keys=OFF;
+        BEGIN;
+        {ddl.format(name=table + "_new")};
+        INSERT INTO {table}_new ({columns}) SELECT {columns} FROM {table};
+        DROP TABLE {table};
+        ALTER TABLE {table}_new RENAME TO {table};
+        COMMIT;
+        PRAGMA foreign_keys=ON;
+    """)
+
+
 def init_db():
-    conn = get_db()
+    conn = _connect()
     cur = conn.cursor()
 
+    # WAL lets dashboard reads proceed while a scan is writing
+    cur.execute("PRAGMA journal_mode=WAL")
+
     # Users table
     cur.execute("""
         CREATE TABLE IF NOT EXISTS users (
@@ -47,27 +156,24 @@ def init_db():
     """)
 
     # Attendance table
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS attendance (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            check_in TEXT NOT NULL,
-            check_out TEXT,
-            FOREIGN KEY(user_id) REFERENCES users(id)
-        )
-    """)
+    cur.execute(ATTENDANCE_DDL.format(name="attendance"))
 
     # Messages table (owner -> staff)
+    cur.execute(MESSAGES_DDL.format(name="messages"))
+
+    # Databases from before ON DELETE CASCADE still have the old foreign keys
+    _ensure_cascade(conn, "attendance", ATTENDANCE_DDL, "id, user_id, check_in, check_out")
+    _ensure_cascade(conn, "messages", MESSAGES_DDL, "id, to_user_id, title, body, created_at")
+
+    # Indexes for the per-user history, open check-in and message lookups
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_att_user_checkin ON attendance(user_id, check_in DESC)")
     cur.execute("""
-        CREATE TABLE IF NOT EXISTS messages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            to_user_id INTEGER NOT NULL,
-            title TEXT,
-            body TEXT NOT NULL,
-            created_at TEXT NOT NULL,
-            FOREIGN KEY(to_user_id) REFERENCES users(id)
-        )
+        CREATE INDEX IF NOT EXISTS idx_att_user_open
+        ON attendance(user_id, check_in) WHERE check_out IS NULL
     """)
+    cur.execute("DROP INDEX IF EXISTS idx_att_date")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_att_checkin ON attendance(check_in)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_msg_user_created ON messages(to_user_id, created_at DESC)")
 
     conn.commit()
     conn.close()
@@ -76,6 +182,34 @@ def init_db():
 init_db()
 
 
+# ----------------- Date Helpers -----------------
+# isoformat() is a direct C fast path; it yields the same strings as
+# strftime("%Y-%m-%d %H:%M:%S") / strftime("%Y-%m-%d").
+def now_str():
+    return datetime.now().isoformat(" ", "seconds")
+
+
+def today_str():
+    return date.today().isoformat()
+
+
+# check_in is stored as 'YYYY-MM-DD HH:MM:SS', which sorts as text, so a day
+# filter is a plain range on the column and can use idx_att_checkin.
+def day_start(day):
+    return f"{day} 00:00:00"
+
+
+def day_end(day):
+    return f"{day} 23:59:59"
+
+
+# ----------------- CSV Helper -----------------
+class Echo:
+    """Pseudo file: write() returns the line so csv.writer can feed a generator."""
+    def write(self, value):
+        return value
+
+
 # ----------------- Auth Decorator -----------------
 def login_required(role=None):
     def decorator(f):
@@ -91,37 +225,119 @@ def login_required(role=None):
     return decorator
 
 
+# ----------------- Dashboard Cache -----------------
+# Rendered dashboard HTML is reused for DASHBOARD_CACHE_TTL seconds. Writes
+# that change what a dashboard shows call invalidate_dashboards(); the TTL
+# covers the rest (e.g. today's status rolling over at midnight).
+_dashboard_cache = {}
+_dashboard_cache_lock = threading.Lock()
+
+
+def cached_dashboard(key_func):
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            # Pending flash messages get rendered into the page, so that
+            # page must neither come from nor go into the cache.
+            if "_flashes" in session:
+                return f(*args, **kwargs)
+            key = key_func()
+            now = time.monotonic()
+            with _dashboard_cache_lock:
+                hit = _dashboard_cache.get(key)
+            if hit and hit[0] > now:
+                return hit[1]
+            html = f(*args, **kwargs)
+            with _dashboard_cache_lock:
+                for k in [k for k, v in _dashboard_cache.items() if v[0] <= now]:
+                    del _dashboard_cache[k]
+                _dashboard_cache[key] = (now + DASHBOARD_CACHE_TTL, html)
+            return html
+        return wrapper
+    return decorator
+
+
+def invalidate_dashboards(*user_ids):
+    """Drop every cached owner view plus the given staff members' dashboards."""
+    ids = {str(u) for u in user_ids}
+    with _dashboard_cache_lock:
+        for key in list(_dashboard_cache):
+            if key[0] == "owner" or str(key[1]) in ids:
+                del _dashboard_cache[key]
+
+
 # ----------------- QR Helper -----------------
-def generate_qr_for_user(user_id):
-    """QR content: ATTEND:<user_id>"""
-    data = f"ATTEND:{user_id}"
-    filename = f"user_{user_id}.png"
-    filepath = os.path.join(QRCODE_DIR, filename)
+# PNG rendering is CPU-bound, so it runs on a worker thread. The filename only
+# depends on user_id, so the users row can be updated before the file exists.
+qr_executor = ThreadPoolExecutor(max_workers=2)
+
 
-    img = qrcode.make(data)
+def qr_filename_for(user_id):
+    return f"user_{user_id}.png"
+
+
+def render_qr(user_id):
+    """QR content: ATTEND:<user_id>"""
+    filepath = os.path.join(QRCODE_DIR, qr_filename_for(user_id))
+    # Content only depends on user_id, so an existing file is already correct
+    if os.path.exists(filepath):
+        return
+
+    # "ATTEND:<id>" is alphanumeric and fits version 1 until ids get long;
+    # fit=True only grows the version when it has to. PyPNGImage skips PIL.
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(f"ATTEND:{user_id}")
+    qr.make(fit=True)
+    img = qr.make_image(image_factory=qrcode.image.pure.PyPNGImage)
     img.save(filepath)
 
+
+def _log_qr_error(future):
+    exc = future.exception()
+    if exc is not None:
+        app.logger.error("QR render failed: %r", exc)
+
+
+def generate_qr_for_user(user_id):
+    """Record the QR filename and queue the PNG render; returns the filename."""
+    filename = qr_filename_for(user_id)
+
     conn = get_db()
     cur = conn.cursor()
     cur.execute("UPDATE users SET qr_filename=? WHERE id=?", (filename, user_id))
     conn.commit()
-    conn.close()
+    invalidate_dashboards(user_id)
 
+    qr_executor.submit(render_qr, user_id).add_done_callback(_log_qr_error)
     return filename
 
 
+# ----------------- Owner Check -----------------
+# Owners are never deleted, so once one exists the answer is cached for the
+# life of the process and "/" stops querying users on every visit.
+_owner_exists = False
+_owner_lock = threading.Lock()
+
+
+def owner_exists():
+    global _owner_exists
+    if not _owner_exists:
+        cur = get_db().execute("SELECT 1 FROM users WHERE role='owner' LIMIT 1")
+        _owner_exists = cur.fetchone() is not None
+    return _owner_exists
+
+
 # ----------------- Routes -----------------
 
 @app.route("/")
 def index():
     # If no owner exists, go to owner registration
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT COUNT(*) AS c FROM users WHERE role='owner'")
-    owner_count = cur.fetchone()["c"]
-    conn.close()
-
-    if owner_count == 0:
+    if not owner_exists():
         return redirect(url_for("register_owner"))
 
     # If logged in, route to dashboard
@@ -137,14 +353,10 @@ def index():
 # ----- Owner first-time registration -----
 @app.route("/register_owner", methods=["GET", "POST"])
 def register_owner():
-    # Only allow if no owner exists
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT COUNT(*) AS c FROM users WHERE role='owner'")
-    owner_count = cur.fetchone()["c"]
-    conn.close()
+    global _owner_exists
 
-    if owner_count > 0:
+    # Only allow if no owner exists
+    if owner_exists():
         return redirect(url_for("login"))
 
     if request.method == "POST":
@@ -155,21 +367,25 @@ def register_owner():
             flash("Username and password required.", "danger")
             return redirect(url_for("register_owner"))
 
+        password_hash = generate_password_hash(password, method=HASH_METHOD)
         conn = get_db()
         cur = conn.cursor()
-        try:
-            cur.execute(
-                "INSERT INTO users (username, password_hash, role) VALUES (?, ?, 'owner')",
-                (username, generate_password_hash(password))
-            )
-            owner_id = cur.lastrowid
-            conn.commit()
-        except sqlite3.IntegrityError:
-            conn.close()
-            flash("Username already exists.", "danger")
-            return redirect(url_for("register_owner"))
+        # Re-check under the lock so two concurrent POSTs can't both create an owner
+        with _owner_lock:
+            if owner_exists():
+                return redirect(url_for("login"))
+            try:
+                cur.execute(
+                    "INSERT INTO users (username, password_hash, role) VALUES (?, ?, 'owner')",
+                    (username, password_hash)
+                )
+                owner_id = cur.lastrowid
+                conn.commit()
+            except sqlite3.IntegrityError:
+                flash("Username already exists.", "danger")
+                return redirect(url_for("register_owner"))
+            _owner_exists = True
 
-        conn.close()
         generate_qr_for_user(owner_id)
         flash("Owner created. Please log in.", "success")
         return redirect(url_for("login"))
@@ -184,11 +400,7 @@ def login():
         username = request.form["username"].strip()
         password = request.form["password"]
 
-        conn = get_db()
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM users WHERE username=?", (username,))
-        user = cur.fetchone()
-        conn.close()
+        user = get_db().execute(SQL_LOGIN_USER, (username,)).fetchone()
 
         if user and check_password_hash(user["password_hash"], password):
             session["user_id"] = user["id"]
@@ -214,32 +426,33 @@ def logout():
 # ----- Owner Dashboard -----
 @app.route("/owner_dashboard")
 @login_required(role="owner")
+@cached_dashboard(lambda: ("owner", session["user_id"], request.full_path))
 def owner_dashboard():
     from_date = request.args.get("from_date") or ""
     to_date = request.args.get("to_date") or ""
+    page = max(request.args.get("page", 1, type=int), 1)
 
     conn = get_db()
     cur = conn.cursor()
 
     # Users with today status
-    today = datetime.now().strftime("%Y-%m-%d")
+    today = today_str()
     cur.execute("""
         SELECT
           u.id,
           u.username,
           u.role,
           u.qr_filename,
-          CASE
-            WHEN EXISTS (
-              SELECT 1 FROM attendance a
-              WHERE a.user_id = u.id
-                AND substr(a.check_in,1,10) = ?
-            ) THEN 'Present'
-            ELSE 'Absent'
-          END AS today_status
+          COALESCE(t.today_status, 'Absent') AS today_status
         FROM users u
+        LEFT JOIN (
+          SELECT user_id, 'Present' AS today_status
+          FROM attendance
+          WHERE check_in >= ? AND check_in <= ?
+          GROUP BY user_id
+        ) t ON t.user_id = u.id
         ORDER BY u.role, u.username
-    """, (today,))
+    """, (day_start(today), day_end(today)))
     users = cur.fetchall()
 
     # Attendance with filters
@@ -251,23 +464,28 @@ def owner_dashboard():
     """
     params = []
     if from_date:
-        query += " AND substr(a.check_in,1,10) >= ?"
-        params.append(from_date)
+        query += " AND a.check_in >= ?"
+        params.append(day_start(from_date))
     if to_date:
-        query += " AND substr(a.check_in,1,10) <= ?"
-        params.append(to_date)
-    query += " ORDER BY a.check_in DESC"
+        query += " AND a.check_in <= ?"
+        params.append(day_end(to_date))
+    # One extra row tells us whether a next page exists
+    query += " ORDER BY a.check_in DESC LIMIT ? OFFSET ?"
+    params += [ATTENDANCE_PAGE_SIZE + 1, (page - 1) * ATTENDANCE_PAGE_SIZE]
 
     cur.execute(query, params)
     attendance = cur.fetchall()
-    conn.close()
+    has_next = len(attendance) > ATTENDANCE_PAGE_SIZE
+    attendance = attendance[:ATTENDANCE_PAGE_SIZE]
 
     return render_template(
         "owner_dashboard.html",
         users=users,
         attendance=attendance,
         from_date=from_date,
-        to_date=to_date
+        to_date=to_date,
+        page=page,
+        has_next=has_next
     )
 
 
@@ -278,8 +496,6 @@ def export_attendance():
     from_date = request.args.get("from_date") or ""
     to_date = request.args.get("to_date") or ""
 
-    conn = get_db()
-    cur = conn.cursor()
     query = """
         SELECT u.username, u.role, a.check_in, a.check_out
         FROM attendance a
@@ -288,27 +504,30 @@ def export_attendance():
     """
     params = []
     if from_date:
-        query += " AND substr(a.check_in,1,10) >= ?"
-        params.append(from_date)
+        query += " AND a.check_in >= ?"
+        params.append(day_start(from_date))
     if to_date:
-        query += " AND substr(a.check_in,1,10) <= ?"
-        params.append(to_date)
+        query += " AND a.check_in <= ?"
+        params.append(day_end(to_date))
     query += " ORDER BY a.check_in DESC"
 
-    cur.execute(query, params)
-    rows = cur.fetchall()
-    conn.close()
-
-    output = StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["username", "role", "check_in", "check_out"])
-    for r in rows:
-        writer.writerow([r["username"], r["role"], r["check_in"], r["check_out"] or ""])
-    csv_data = output.getvalue()
-    output.close()
+    def generate():
+        # Stream one CSV line per row straight off the cursor so large
+        # exports never hold the full result set in memory. The connection
+        # is opened here and closed in finally, so it is released whether
+        # the stream finishes, fails, or is dropped by the client.
+        writer = csv.writer(Echo())
+        conn = _connect()
+        try:
+            cur = conn.execute(query, params)
+            yield writer.writerow(["username", "role", "check_in", "check_out"])
+            for r in cur:
+                yield writer.writerow([r["username"], r["role"], r["check_in"], r["check_out"] or ""])
+        finally:
+            conn.close()
 
     return Response(
-        csv_data,
+        stream_with_context(generate()),
         mimetype="text/csv",
         headers={"Content-Disposition": "attachment; filename=attendance_export.csv"}
     )
@@ -333,7 +552,7 @@ def manage_staff():
             try:
                 cur.execute(
                     "INSERT INTO users (username, password_hash, role) VALUES (?, ?, 'staff')",
-                    (username, generate_password_hash(password))
+                    (username, generate_password_hash(password, method=HASH_METHOD))
                 )
                 staff_id = cur.lastrowid
                 conn.commit()
@@ -349,22 +568,20 @@ def manage_staff():
             if user:
                 # delete QR file
                 if user["qr_filename"]:
-                    path = os.path.join(QRCODE_DIR, user["qr_filename"])
-                    if os.path.exists(path):
-                        os.remove(path)
-                # delete attendance & messages & user
-                cur.execute("DELETE FROM attendance WHERE user_id=?", (user_id,))
-                cur.execute("DELETE FROM messages WHERE to_user_id=?", (user_id,))
-                cur.execute("DELETE FROM users WHERE id=?", (user_id,))
+                    try:
+                        os.unlink(os.path.join(QRCODE_DIR, user["qr_filename"]))
+                    except FileNotFoundError:
+                        pass
+                # attendance & messages go with the user via ON DELETE CASCADE
+                cur.execute("DELETE FROM users WHERE id=? AND role='staff'", (user_id,))
                 conn.commit()
+                invalidate_dashboards(user_id)
                 flash(f"Staff '{user['username']}' deleted.", "info")
 
-        conn.close()
         return redirect(url_for("manage_staff"))
 
     cur.execute("SELECT id, username FROM users WHERE role='staff' ORDER BY username")
     staff = cur.fetchall()
-    conn.close()
     return render_template("manage_staff.html", staff=staff)
 
 
@@ -385,33 +602,25 @@ def scan_qr():
             return redirect(url_for("scan_qr"))
 
         conn = get_db()
-        cur = conn.cursor()
-        cur.execute("SELECT id, username, role FROM users WHERE id=?", (user_id,))
-        user = cur.fetchone()
+        user = conn.execute(SQL_USER_BY_ID, (user_id,)).fetchone()
         if not user or user["role"] != "staff":
-            conn.close()
             flash("QR does not belong to a staff member.", "danger")
             return redirect(url_for("scan_qr"))
 
-        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        now = now_str()
 
         # open attendance if exists
-        cur.execute("""
-            SELECT * FROM attendance
-            WHERE user_id=? AND check_out IS NULL
-            ORDER BY check_in DESC LIMIT 1
-        """, (user_id,))
-        open_row = cur.fetchone()
+        open_row = conn.execute(SQL_FIND_OPEN_ATTENDANCE, (user_id,)).fetchone()
 
         if open_row:
-            cur.execute("UPDATE attendance SET check_out=? WHERE id=?", (now, open_row["id"]))
+            conn.execute(SQL_CHECK_OUT, (now, open_row["id"]))
             msg = f"Checked OUT {user['username']} at {now}"
         else:
-            cur.execute("INSERT INTO attendance (user_id, check_in) VALUES (?, ?)", (user_id, now))
+            conn.execute(SQL_CHECK_IN, (user_id, now))
             msg = f"Checked IN {user['username']} at {now}"
 
         conn.commit()
-        conn.close()
+        invalidate_dashboards(user_id)
         flash(msg, "success")
         return redirect(url_for("scan_qr"))
 
@@ -434,31 +643,23 @@ def owner_mark_attendance():
         return redirect(url_for("owner_dashboard"))
 
     conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT id, username, role FROM users WHERE id=?", (staff_id,))
-    user = cur.fetchone()
+    user = conn.execute(SQL_USER_BY_ID, (staff_id,)).fetchone()
     if not user or user["role"] != "staff":
-        conn.close()
         flash("Selected user is not staff.", "danger")
         return redirect(url_for("owner_dashboard"))
 
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    cur.execute("""
-        SELECT * FROM attendance
-        WHERE user_id=? AND check_out IS NULL
-        ORDER BY check_in DESC LIMIT 1
-    """, (staff_id,))
-    open_row = cur.fetchone()
+    now = now_str()
+    open_row = conn.execute(SQL_FIND_OPEN_ATTENDANCE, (staff_id,)).fetchone()
 
     if open_row:
-        cur.execute("UPDATE attendance SET check_out=? WHERE id=?", (now, open_row["id"]))
+        conn.execute(SQL_CHECK_OUT, (now, open_row["id"]))
         msg = f"Checked OUT {user['username']} at {now}"
     else:
-        cur.execute("INSERT INTO attendance (user_id, check_in) VALUES (?, ?)", (staff_id, now))
+        conn.execute(SQL_CHECK_IN, (staff_id, now))
         msg = f"Checked IN {user['username']} at {now}"
 
     conn.commit()
-    conn.close()
+    invalidate_dashboards(staff_id)
     flash(msg, "success")
     return redirect(url_for("owner_dashboard"))
 
@@ -475,15 +676,23 @@ def send_message():
         flash("Select staff and enter a message.", "danger")
         return redirect(url_for("owner_dashboard"))
 
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        to_user_id = int(to_user_id)
+    except ValueError:
+        flash("Invalid staff selected.", "danger")
+        return redirect(url_for("owner_dashboard"))
+
     conn = get_db()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO messages (to_user_id, title, body, created_at) VALUES (?, ?, ?, ?)",
-        (to_user_id, title, body, now)
-    )
+    # With foreign_keys=ON a missing recipient would fail the insert; check it up front
+    user = conn.execute(SQL_USER_BY_ID, (to_user_id,)).fetchone()
+    if not user or user["role"] != "staff":
+        flash("Selected user is not staff.", "danger")
+        return redirect(url_for("owner_dashboard"))
+
+    now = now_str()
+    conn.execute(SQL_INSERT_MESSAGE, (to_user_id, title, body, now))
     conn.commit()
-    conn.close()
+    invalidate_dashboards(to_user_id)
     flash("Information sent.", "success")
     return redirect(url_for("owner_dashboard"))
 
@@ -491,42 +700,28 @@ def send_message():
 # ----- Staff Dashboard -----
 @app.route("/staff_dashboard")
 @login_required(role="staff")
+@cached_dashboard(lambda: ("staff", session["user_id"]))
 def staff_dashboard():
     user_id = session["user_id"]
 
     conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT username, qr_filename FROM users WHERE id=?", (user_id,))
-    user = cur.fetchone()
+    user = conn.execute(SQL_STAFF_PROFILE, (user_id,)).fetchone()
     qr_filename = user["qr_filename"]
 
     if not qr_filename:
         qr_filename = generate_qr_for_user(user_id)
 
     # Attendance logs
-    cur.execute("""
-        SELECT check_in, check_out FROM attendance
-        WHERE user_id=? ORDER BY check_in DESC LIMIT 30
-    """, (user_id,))
-    logs = cur.fetchall()
+    logs = conn.execute(SQL_STAFF_LOGS, (user_id,)).fetchall()
 
     # Today status
-    today = datetime.now().strftime("%Y-%m-%d")
-    cur.execute("""
-        SELECT CASE WHEN EXISTS (
-          SELECT 1 FROM attendance WHERE user_id=? AND substr(check_in,1,10)=?
-        ) THEN 'Present' ELSE 'Absent' END AS today_status
-    """, (user_id, today))
-    today_status = cur.fetchone()["today_status"]
+    today = today_str()
+    today_status = conn.execute(
+        SQL_STAFF_TODAY_STATUS, (user_id, day_start(today), day_end(today))
+    ).fetchone()["today_status"]
 
     # Messages
-    cur.execute("""
-        SELECT title, body, created_at FROM messages
-        WHERE to_user_id=? ORDER BY created_at DESC LIMIT 20
-    """, (user_id,))
-    messages = cur.fetchall()
-
-    conn.close()
+    messages = conn.execute(SQL_STAFF_MESSAGES, (user_id,)).fetchall()
 
     return render_template(
         "staff_dashboard.html",
@@ -1,22 +1,47 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 import pytz
 from datetime import datetime, time
 import json
 import hashlib
 import os
+import csv
 
 # --- CONFIGURATION ---
 ATTENDANCE_FILE = 'attendance.csv'
 USERS_FILE = 'users.json'
 INDIA_TIMEZONE = pytz.timezone('Asia/Kolkata')
 PASSWORD_SALT = "a_unique_salt_for_your_app"
+ATTENDANCE_COLUMNS = ['username', 'date', 'check_in_time', 'is_present']
+# check_in_time is pinned to text, otherwise pyarrow infers time32 and the
+# dashboards can no longer parse it as a time string.
+ATTENDANCE_CONVERT_OPTIONS = pa_csv.ConvertOptions(
+    column_types={'username': pa.string(), 'date': pa.timestamp('ns'), 'check_in_time': pa.string()},
+    strings_can_be_null=True,
+)
 
 # --- UTILITY FUNCTIONS ---
 def hash_password(password: str) -> str:
     """Hashes a password with a salt for security."""
     return hashlib.sha256(str.encode(password + PASSWORD_SALT)).hexdigest()
 
+@st.cache_data(show_spinner=False, max_entries=4)
+def read_attendance_csv(mtime_ns: int) -> pd.DataFrame:
+    """Parses attendance.csv with pyarrow. mtime_ns is only the cache key, so
+    reruns reuse the parsed frame until the file is written again."""
+    try:
+        return pa_csv.read_csv(ATTENDANCE_FILE, convert_options=ATTENDANCE_CONVERT_OPTIONS).to_pandas()
+    except pa.ArrowInvalid:
+        # e.g. a hand-edited date pyarrow can't parse; load_data() coerces it
+        pass
+    try:
+        return pd.read_csv(ATTENDANCE_FILE)
+    except (ValueError, IOError):
+        return pd.DataFrame(columns=ATTENDANCE_COLUMNS)
+
 def load_data():
     """Loads user and attendance data, initializing if files don't exist."""
     # Load or initialize users.json
@@ -36,19 +61,16 @@ def load_data():
 
     # Load or initialize attendance.csv
     if os.path.exists(ATTENDANCE_FILE):
-        try:
-            attendance_df = pd.read_csv(ATTENDANCE_FILE, parse_dates=['date'], dayfirst=False)
-        except (ValueError, IOError):
-            attendance_df = pd.DataFrame(columns=['username', 'date', 'check_in_time', 'is_present'])
+        attendance_df = read_attendance_csv(os.stat(ATTENDANCE_FILE).st_mtime_ns)
     else:
-        attendance_df = pd.DataFrame(columns=['username', 'date', 'check_in_time', 'is_present'])
+        attendance_df = pd.DataFrame(columns=ATTENDANCE_COLUMNS)
         save_attendance_data(attendance_df)
 
-    # Ensure date column is datetime (coerce invalid)
-    if 'date' in attendance_df.columns:
-        attendance_df['date'] = pd.to_datetime(attendance_df['date'], errors='coerce')
-    else:
+    # Ensure date column is datetime (coerce invalid); already typed when pyarrow read it
+    if 'date' not in attendance_df.columns:
         attendance_df['date'] = pd.to_datetime(pd.Series([], dtype='datetime64[ns]'))
+    elif not pd.api.types.is_datetime64_any_dtype(attendance_df['date']):
+        attendance_df['date'] = pd.to_datetime(attendance_df['date'], errors='coerce')
 
     return users, attendance_df
 
@@ -82,6 +104,16 @@ def save_attendance_data(df: pd.DataFrame):
 
     df_copy.to_csv(ATTENDANCE_FILE, index=False)
 
+def append_attendance_record(record: dict):
+    """Appends one already-formatted row to the CSV instead of rewriting the whole file."""
+    with open(ATTENDANCE_FILE, 'a', newline='') as f:
+        csv.writer(f).writerow([record[c] for c in ATTENDANCE_COLUMNS])
+
+def attendance_status(is_present: pd.Series) -> pd.Series:
+    """Maps is_present values to 'Present'/'Absent' in one vectorized pass."""
+    present = is_present.astype(str).str.lower().isin(('true', '1', 'yes'))
+    return pd.Series(np.where(present, 'Present', 'Absent'), index=is_present.index)
+
 # --- INITIALIZATION ---
 users, attendance_df = load_data()
 
@@ -135,10 +167,10 @@ def show_owner_dashboard():
     st.subheader("Full Attendance Sheet")
     if not attendance_df.empty:
         display_df = attendance_df.copy()
-        display_df['date'] = pd.to_datetime(display_df['date'], errors='coerce').dt.strftime('%Y-%m-%d')
+        display_df['date'] = display_df['date'].dt.strftime('%Y-%m-%d')  # parsed once in load_data
         display_df['check_in_time'] = pd.to_datetime(display_df['check_in_time'], errors='coerce').dt.strftime('%I:%M %p')
         display_df['check_in_time'] = display_df['check_in_time'].fillna('')
-        display_df['status'] = display_df['is_present'].apply(lambda x: 'Present' if str(x).lower() in ('true','1','yes') or x is True else 'Absent')
+        display_df['status'] = attendance_status(display_df['is_present'])
         st.dataframe(display_df[['username', 'date', 'check_in_time', 'status']].sort_values(by='date', ascending=False), use_container_width=True)
     else:
         st.info("No attendance records found.")
@@ -152,10 +184,10 @@ def show_staff_dashboard():
 
     if not staff_attendance.empty:
         display_df = staff_attendance.copy()
-        display_df['date'] = pd.to_datetime(display_df['date'], errors='coerce').dt.strftime('%Y-%m-%d')
+        display_df['date'] = display_df['date'].dt.strftime('%Y-%m-%d')  # parsed once in load_data
         display_df['check_in_time'] = pd.to_datetime(display_df['check_in_time'], errors='coerce').dt.strftime('%I:%M %p')
         display_df['check_in_time'] = display_df['check_in_time'].fillna('')
-        display_df['status'] = display_df['is_present'].apply(lambda x: 'Present' if str(x).lower() in ('true','1','yes') or x is True else 'Absent')
+        display_df['status'] = attendance_status(display_df['is_present'])
         st.dataframe(display_df[['date', 'check_in_time', 'status']].sort_values(by='date', ascending=False), use_container_width=True)
     else:
         st.info("No attendance records found for you.")
@@ -210,20 +242,19 @@ def show_mark_attendance_page():
             mark_absent_button = st.form_submit_button("Mark Absent")
 
     if mark_present_button or mark_absent_button:
-        if 'date' not in attendance_df.columns:
-            attendance_df['date'] = pd.to_datetime(pd.Series([], dtype='datetime64[ns]'))
-
-        attendance_df['date'] = pd.to_datetime(attendance_df['date'], errors='coerce')
-
         now_ist = datetime.now(INDIA_TIMEZONE)
         current_date = now_ist.date()
         current_time = now_ist.time()
 
+        # load_data() already parsed 'date' to midnight timestamps, so today's
+        # rows match one Timestamp without re-parsing or building .dt.date objects
+        today_ts = pd.Timestamp(current_date)
+
         has_marked_today = False
         if not attendance_df.empty:
             try:
                 mask_user = attendance_df['username'] == selected_staff
-                mask_date = attendance_df['date'].dt.date == current_date
+                mask_date = attendance_df['date'] == today_ts
                 has_marked_today = (mask_user & mask_date).any()
             except Exception:
                 has_marked_today = False
@@ -233,15 +264,21 @@ def show_mark_attendance_page():
         else:
             is_present = bool(mark_present_button)
             check_in_str = current_time.strftime('%H:%M:%S') if is_present else ""
-            new_record = pd.DataFrame([{
+            new_record = {
                 'username': selected_staff,
                 'date': pd.to_datetime(current_date),
                 'check_in_time': check_in_str,
                 'is_present': is_present
-            }])
+            }
 
-            attendance_df = pd.concat([attendance_df, new_record], ignore_index=True)
-            save_attendance_data(attendance_df)
+            # Only the new row hits disk. A file with a different column layout
+            # is rewritten in full so every row lines up with the header again.
+            if list(attendance_df.columns) == ATTENDANCE_COLUMNS:
+                attendance_df.loc[len(attendance_df)] = [new_record[c] for c in ATTENDANCE_COLUMNS]
+                append_attendance_record({**new_record, 'date': current_date.strftime('%Y-%m-%d')})
+            else:
+                attendance_df = pd.concat([attendance_df, pd.DataFrame([new_record])], ignore_index=True)
+                save_attendance_data(attendance_df)
 
             if is_present:
                 st.success(f"Attendance for '{selected_staff}' marked as Present ({current_date} {check_in_str})!")
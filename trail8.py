@@ -1,104 +1,361 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.dataset as pa_ds
+import pyarrow.parquet as pq
 import pytz
 from datetime import datetime, time
 import json
 import hashlib
 import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson  # faster JSON for users.json; optional
+except ImportError:
+    orjson = None
 
 # --- CONFIGURATION ---
-ATTENDANCE_FILE = 'attendance.csv'
+ATTENDANCE_DIR = 'attendance_ds'  # Parquet dataset, one username=<u> partition per staff member
+LEGACY_PARQUET_FILE = 'attendance.parquet'  # older single-file layouts, migrated on first load
+LEGACY_ATTENDANCE_FILE = 'attendance.csv'
+PENDING_ATTENDANCE_FILE = 'attendance_pending.parquet'  # new marks not yet compacted into ATTENDANCE_DIR
+PENDING_FLUSH_ROWS = 50
+ATTENDANCE_COLUMNS = ['username','date','check_in_time','check_out_time','is_present']
+EDITABLE_COLUMNS = ['check_in_time','check_out_time','is_present']  # written in one .loc row update
+# In-memory dtypes: Arrow-backed strings and flags (contiguous buffers instead of Python objects);
+# usernames stay categorical, 'date' stays datetime64[ns]
+ATTENDANCE_DTYPES = {'username': 'category', 'check_in_time': 'string[pyarrow]',
+                     'check_out_time': 'string[pyarrow]', 'is_present': 'bool[pyarrow]'}
+# Fixed schema for the legacy CSV so pyarrow parses every column in one pass
+LEGACY_CSV_CONVERT_OPTIONS = pa_csv.ConvertOptions(
+    column_types={'username': pa.string(), 'date': pa.date32(), 'check_in_time': pa.string(),
+                  'check_out_time': pa.string(), 'is_present': pa.bool_()},
+    true_values=['true', 'True', 'TRUE', '1', 'yes', 'Yes', 'YES'],
+    false_values=['false', 'False', 'FALSE', '0', 'no', 'No', 'NO'],
+    strings_can_be_null=True,
+)
+ATTENDANCE_SCHEMA = pa.schema([('username', pa.string()), ('date', pa.timestamp('ns')),
+                               ('check_in_time', pa.string()), ('check_out_time', pa.string()),
+                               ('is_present', pa.bool_())])
+ATTENDANCE_PARTITIONING = pa_ds.partitioning(pa.schema([('username', pa.string())]), flavor='hive')
+# Show dates as YYYY-MM-DD without copying the frame to convert the column
+DATE_COLUMN_CONFIG = {'date': st.column_config.DatetimeColumn('date', format='YYYY-MM-DD')}
 USERS_FILE = 'users.json'
 INDIA_TIMEZONE = pytz.timezone('Asia/Kolkata')
 PASSWORD_SALT = "a_unique_salt_for_your_app"
+_SALT_BYTES = PASSWORD_SALT.encode()
+
+# st.fragment was st.experimental_fragment before Streamlit 1.37
+fragment = getattr(st, 'fragment', None) or st.experimental_fragment
 
 # --- UTILITIES ---
 
 def hash_password(password: str) -> str:
     """Hashes a password with a salt."""
-    return hashlib.sha256((password + PASSWORD_SALT).encode()).hexdigest()
+    h = hashlib.sha256(password.encode())
+    h.update(_SALT_BYTES)
+    return h.hexdigest()
+
+def default_users():
+    """Default owner account. Built only on load_users' fallback path, which st.cache_data runs once per users.json mtime."""
+    return {"owner": {"password": hash_password("owner_password"), "role": "owner"}}
+
+def _file_mtime(path):
+    """Returns the file's modification time in ns, or None if it doesn't exist.
+    For a directory, returns the (path, mtime) of every file under it, so rewriting any partition changes it."""
+    if os.path.isdir(path):
+        return tuple(sorted((os.path.join(root, f), os.stat(os.path.join(root, f)).st_mtime_ns)
+                            for root, _, files in os.walk(path) for f in files))
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
 
-def load_users():
-    """Loads user data from a JSON file."""
+@st.cache_data(show_spinner=False, max_entries=8)
+def load_users(mtime):
+    """Loads user data from a JSON file. `mtime` keys the cache so edits are picked up."""
     if os.path.exists(USERS_FILE):
-        with open(USERS_FILE, 'r') as f:
+        with open(USERS_FILE, 'rb') as f:
             try:
-                return json.load(f)
+                data = f.read()
+                return orjson.loads(data) if orjson else json.loads(data)
             except Exception:
-                return {"owner": {"password": hash_password("owner_password"), "role": "owner"}}
+                return default_users()
     # Default owner account if file doesn't exist
-    return {"owner": {"password": hash_password("owner_password"), "role": "owner"}}
+    return default_users()
 
 def save_users(users):
-    """Saves user data to a JSON file."""
-    with open(USERS_FILE, 'w') as f:
-        json.dump(users, f)
-
-def load_attendance_data():
-    """Loads attendance data from a CSV file and ensures expected columns and datatypes."""
-    if os.path.exists(ATTENDANCE_FILE):
-        try:
-            df = pd.read_csv(ATTENDANCE_FILE, dtype=str)  # read as strings first
-        except Exception:
-            df = pd.DataFrame(columns=['username','date','check_in_time','check_out_time','is_present'])
-        # Ensure columns exist
-        expected_cols = ['username','date','check_in_time','check_out_time','is_present']
-        for c in expected_cols:
-            if c not in df.columns:
-                df[c] = pd.NA
-        # Convert 'date' column to datetime where possible
-        df['date'] = pd.to_datetime(df['date'], errors='coerce')
-        # Normalize is_present to booleans where possible
-        df['is_present'] = df['is_present'].map(lambda v: True if str(v).lower() in ['true','1','yes'] else (False if str(v).lower() in ['false','0','no'] else v))
-        return df[expected_cols]
-    # Return empty frame with expected columns
-    return pd.DataFrame(columns=['username','date','check_in_time','check_out_time','is_present'])
-
-def save_attendance_data(df: pd.DataFrame):
-    """Saves attendance data to a CSV file with a clean date format (YYYY-MM-DD)."""
-    df_to_save = df.copy()
-    # Convert date to YYYY-MM-DD strings (or empty)
-    df_to_save['date'] = pd.to_datetime(df_to_save['date'], errors='coerce').dt.date
-    # Convert NaT to empty strings for CSV clarity
-    df_to_save['date'] = df_to_save['date'].astype(object).where(df_to_save['date'].notna(), '')
-    # Ensure times and is_present are strings
-    df_to_save['check_in_time'] = df_to_save['check_in_time'].fillna('')
-    df_to_save['check_out_time'] = df_to_save['check_out_time'].fillna('')
-    df_to_save['is_present'] = df_to_save['is_present'].apply(lambda v: str(bool(v)) if pd.notna(v) and v != '' else '')
-    df_to_save.to_csv(ATTENDANCE_FILE, index=False)
-
-def ensure_date_column():
-    """Ensure global attendance_df has a 'date' column and it is datetimelike (in-place)."""
-    global attendance_df
-    if 'date' not in attendance_df.columns:
-        attendance_df['date'] = pd.NaT
-    attendance_df['date'] = pd.to_datetime(attendance_df['date'], errors='coerce')
-
-def parse_time_str_to_time(s):
-    """Parse a time string like 'HH:MM:SS' (or other formats) to a time object. Fallback to current time."""
+    """Saves user data to a JSON file. Writes a temp file and renames it, so readers never see a partial file."""
+    tmp_path = USERS_FILE + '.tmp'
+    if orjson:
+        with open(tmp_path, 'wb') as f:
+            f.write(orjson.dumps(users))
+    else:
+        with open(tmp_path, 'w') as f:
+            json.dump(users, f)
+    os.replace(tmp_path, USERS_FILE)
+
+@st.cache_resource
+def users_writer():
+    """One background thread for users.json writes, shared by all sessions: saves don't block a rerun and stay in order."""
+    return ThreadPoolExecutor(max_workers=1)
+
+def load_legacy_attendance_csv():
+    """Loads attendance data from the old CSV file with pyarrow's threaded reader.
+    Falls back to the pandas parser for files pyarrow rejects (missing columns, odd dates or flags)."""
     try:
-        if s is None:
-            return datetime.now(INDIA_TIMEZONE).time()
-        if isinstance(s, (pd.Timestamp, datetime)):
-            return s.time()
-        s_str = str(s)
-        if s_str.strip() == '' or s_str.lower() == 'nan':
-            return datetime.now(INDIA_TIMEZONE).time()
-        parsed = pd.to_datetime(s_str, errors='coerce')
-        if pd.isna(parsed):
-            # final fallback
-            return datetime.now(INDIA_TIMEZONE).time()
-        return parsed.time()
+        table = pa_csv.read_csv(LEGACY_ATTENDANCE_FILE,
+                                read_options=pa_csv.ReadOptions(use_threads=True),
+                                convert_options=LEGACY_CSV_CONVERT_OPTIONS)
+    except (pa.ArrowInvalid, OSError):
+        return load_legacy_attendance_csv_pandas()
+    if not set(ATTENDANCE_COLUMNS).issubset(table.column_names):
+        return load_legacy_attendance_csv_pandas()
+    df = table.to_pandas(date_as_object=False, types_mapper={pa.bool_(): pd.BooleanDtype()}.get)
+    df['date'] = df['date'].astype('datetime64[ns]')
+    return df[ATTENDANCE_COLUMNS]
+
+def load_legacy_attendance_csv_pandas():
+    """Loads attendance data from the old CSV file, coercing its string columns to proper datatypes.
+    Only reached for files that don't fit the fixed schema, so values are read as strings and coerced leniently."""
+    try:
+        # One C-engine pass over just the known columns
+        df = pd.read_csv(LEGACY_ATTENDANCE_FILE, engine='c', usecols=lambda c: c in ATTENDANCE_COLUMNS, dtype='string')
     except Exception:
-        return datetime.now(INDIA_TIMEZONE).time()
-
-# Load data at the start of the app
-users = load_users()
-attendance_df = load_attendance_data()
+        df = pd.DataFrame(columns=ATTENDANCE_COLUMNS)
+    # Ensure columns exist
+    for c in ATTENDANCE_COLUMNS:
+        if c not in df.columns:
+            df[c] = pd.NA
+    # Convert 'date' column to datetime where possible: fixed YYYY-MM-DD fast path, lenient parse for the rest
+    dates = df['date']
+    df['date'] = pd.to_datetime(dates, format='%Y-%m-%d', errors='coerce')
+    retry = df['date'].isna() & dates.notna()
+    if retry.any():
+        df.loc[retry, 'date'] = pd.to_datetime(dates[retry], format='mixed', errors='coerce')
+    # Normalize is_present to booleans where possible (vectorized; unrecognized values become NA)
+    present = df['is_present'].astype('string').str.lower()
+    truthy = present.isin(['true','1','yes'])
+    falsy = present.isin(['false','0','no'])
+    df['is_present'] = pd.Series(np.where(truthy, True, np.where(falsy, False, pd.NA)), index=df.index).astype(pd.BooleanDtype())
+    return df[ATTENDANCE_COLUMNS]
+
+def read_attendance_dataset():
+    """Reads every username partition of ATTENDANCE_DIR into one frame, ordered by date."""
+    table = pa_ds.dataset(ATTENDANCE_DIR, format='parquet', partitioning=ATTENDANCE_PARTITIONING).to_table()
+    if table.num_rows == 0:
+        return pd.DataFrame(columns=ATTENDANCE_COLUMNS)
+    df = table.to_pandas(types_mapper={pa.string(): pd.StringDtype('pyarrow'),
+                                       pa.bool_(): pd.ArrowDtype(pa.bool_())}.get).reindex(columns=ATTENDANCE_COLUMNS)
+    # Partitions come back grouped by user; a stable sort by date gives a chronological sheet
+    return df.sort_values('date', kind='stable', ignore_index=True)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def load_attendance_data(mtime):
+    """Loads attendance data from the Parquet dataset; dates and booleans round-trip without conversion.
+    `mtime` keys the cache so edits are picked up."""
+    migrate = False
+    if os.path.isdir(ATTENDANCE_DIR):
+        df = read_attendance_dataset()
+    elif os.path.exists(LEGACY_PARQUET_FILE):
+        df = pd.read_parquet(LEGACY_PARQUET_FILE, engine='pyarrow').reindex(columns=ATTENDANCE_COLUMNS)
+        migrate = True
+    elif os.path.exists(LEGACY_ATTENDANCE_FILE):
+        df = load_legacy_attendance_csv()
+        migrate = True
+    else:
+        # Empty frame with expected columns
+        df = pd.DataFrame(columns=ATTENDANCE_COLUMNS)
+    # Few staff over many rows: usernames become small integer codes
+    df = df.astype(ATTENDANCE_DTYPES)
+    # Invariant for the rest of the app: 'date' is datetime64[ns], so nothing downstream re-parses it
+    df['date'] = pd.to_datetime(df['date'], errors='coerce').astype('datetime64[ns]')
+    if migrate:
+        # One-time migration: the old file stays on disk, but the dataset is used from now on
+        save_attendance_data(df)
+    return df
+
+def attendance_table(df: pd.DataFrame) -> pa.Table:
+    """Converts df to an Arrow table with ATTENDANCE_SCHEMA, column by column (no intermediate frame copy).
+    A fixed schema also keeps all-null columns typed, so every partition has the same schema."""
+    return pa.Table.from_arrays(
+        [pa.Array.from_pandas(df[c], type=ATTENDANCE_SCHEMA.field(c).type) for c in ATTENDANCE_COLUMNS],
+        schema=ATTENDANCE_SCHEMA)
+
+def save_attendance_data(df: pd.DataFrame, usernames=None):
+    """Saves the attendance sheet df to the partitioned dataset.
+    With `usernames`, only those staff members' partitions are rewritten; all others stay as they are on disk."""
+    if usernames is None or any(pd.isna(u) for u in usernames):
+        shutil.rmtree(ATTENDANCE_DIR, ignore_errors=True)
+        os.makedirs(ATTENDANCE_DIR)
+    else:
+        usernames = set(usernames)
+        df = df[df['username'].isin(usernames)]
+        # Partitions whose last rows were deleted won't be overwritten below, so remove them here
+        emptied = list(usernames - set(df['username']))
+        if emptied:
+            dataset = pa_ds.dataset(ATTENDANCE_DIR, format='parquet', partitioning=ATTENDANCE_PARTITIONING)
+            for fragment in dataset.get_fragments(filter=pa_ds.field('username').isin(emptied)):
+                os.remove(fragment.path)
+    pa_ds.write_dataset(attendance_table(df), ATTENDANCE_DIR, format='parquet',
+                        partitioning=ATTENDANCE_PARTITIONING, basename_template='part-{i}.parquet',
+                        existing_data_behavior='delete_matching')
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def load_pending_rows(mtime):
+    """Loads the buffered new marks as a list of row dicts. `mtime` keys the cache."""
+    if os.path.exists(PENDING_ATTENDANCE_FILE):
+        return pd.read_parquet(PENDING_ATTENDANCE_FILE, engine='pyarrow').to_dict('records')
+    return []
+
+def sync_session_data(include_attendance=True):
+    """Loads users (and attendance, when requested) into st.session_state,
+    reloading only when a file changed on disk."""
+    sources = [('users', USERS_FILE, load_users)]
+    if include_attendance:
+        sources += [('attendance_df', ATTENDANCE_DIR, load_attendance_data),
+                    ('pending_rows', PENDING_ATTENDANCE_FILE, load_pending_rows)]
+    changed = set()
+    if users_write_pending():
+        # Our own queued write is newer than the file; keep the session copy until it lands
+        sources = sources[1:]
+    for key, path, loader in sources:
+        mtime = _file_mtime(path)
+        if key not in st.session_state or st.session_state.get(f'{key}_mtime') != mtime:
+            st.session_state[key] = loader(mtime)
+            st.session_state[f'{key}_mtime'] = mtime
+            changed.add(key)
+    if 'users' in changed:
+        index_roles(st.session_state.users)
+    if changed - {'users'}:
+        index_attendance(attendance_frame())
+
+def index_roles(users):
+    """Builds st.session_state.by_role (role -> usernames) in one pass over users."""
+    by_role = {'owner': [], 'staff': []}
+    for u, d in users.items():
+        by_role.setdefault(d.get('role'), []).append(u)
+    st.session_state.by_role = by_role
+
+def attendance_fingerprint():
+    """A cheap key that changes whenever the session's attendance data is saved or reloaded."""
+    return (st.session_state.attendance_df_mtime, st.session_state.pending_rows_mtime,
+            len(st.session_state.pending_rows))
+
+def session_memo(name, key, build):
+    """Returns the value stored under st.session_state[name] if it was built for `key`; otherwise calls build()."""
+    cached = st.session_state.get(name)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    value = build()
+    st.session_state[name] = (key, value)
+    return value
+
+def attendance_frame():
+    """Returns the full attendance sheet: the loaded frame plus any buffered new marks.
+    The combined frame is built once per change to the data, not on every rerun."""
+    df = st.session_state.attendance_df
+    pending = st.session_state.pending_rows
+    if not pending:
+        return df
+
+    def build():
+        new_rows = pd.DataFrame(pending, columns=ATTENDANCE_COLUMNS)
+        full = pd.concat([df, new_rows], ignore_index=True) if len(df) else new_rows
+        return full.astype(ATTENDANCE_DTYPES)
+    return session_memo('attendance_frame_cache', attendance_fingerprint(), build)
+
+def staff_slice(username):
+    """Returns username's rows of the attendance sheet, rebuilt only when the data changes."""
+    return session_memo('staff_slice_cache', (username, attendance_fingerprint()),
+                        lambda: attendance_frame().loc[st.session_state.user_rows.get(username, [])])
+
+def buffer_attendance_row(row):
+    """Buffers a new mark in the small pending file instead of rewriting the whole sheet.
+    The buffer is compacted into ATTENDANCE_DIR once it reaches PENDING_FLUSH_ROWS."""
+    pending = st.session_state.pending_rows
+    pending.append(row)
+    if len(pending) >= PENDING_FLUSH_ROWS:
+        commit_attendance(attendance_frame(), usernames=[])
+        return
+    pq.write_table(attendance_table(pd.DataFrame(pending, columns=ATTENDANCE_COLUMNS)), PENDING_ATTENDANCE_FILE)
+    st.session_state.pending_rows_mtime = _file_mtime(PENDING_ATTENDANCE_FILE)
+
+def flush_pending_rows():
+    """Compacts any buffered marks into ATTENDANCE_DIR."""
+    if st.session_state.get('pending_rows'):
+        commit_attendance(attendance_frame(), usernames=[])
+
+def index_attendance(df: pd.DataFrame):
+    """Builds the session lookups for df: (username, date ordinal) -> row label, and username -> row labels."""
+    idx_map = {}
+    for i, u, d in zip(df.index, df['username'], df['date']):
+        if pd.notna(d):
+            idx_map.setdefault((u, d.toordinal()), i)
+    st.session_state.idx_map = idx_map
+    st.session_state.user_rows = {u: list(rows) for u, rows in df.groupby('username', sort=False, observed=True).groups.items()}
+
+def commit_users(users):
+    """Updates the session copy of users right away and queues the users.json write in the background."""
+    st.session_state.users = users
+    index_roles(users)
+    st.session_state.users_write = users_writer().submit(save_users, dict(users))
+
+def users_write_pending():
+    """True while this session's last users.json write is queued; reports it if it failed."""
+    future = st.session_state.get('users_write')
+    if future is None:
+        return False
+    if not future.done():
+        return True
+    del st.session_state.users_write
+    if future.exception() is not None:
+        st.error(f"Could not save users: {future.exception()}")
+    return False
+
+def flush_users():
+    """Blocks until this session's queued users.json write has landed."""
+    future = st.session_state.get('users_write')
+    if future is not None:
+        future.result()
+        del st.session_state.users_write
+
+def commit_attendance(df: pd.DataFrame, usernames=None):
+    """Saves the full attendance sheet (buffered marks included) and keeps the session copy in step.
+    `usernames` lists the staff whose rows changed; None rewrites every partition."""
+    pending = st.session_state.pending_rows
+    if usernames is not None:
+        # Buffered marks are folded into their users' partitions too
+        usernames = set(usernames) | {r['username'] for r in pending}
+    save_attendance_data(df, usernames)
+    st.session_state.attendance_df = df
+    st.session_state.attendance_df_mtime = _file_mtime(ATTENDANCE_DIR)
+    if pending:
+        st.session_state.pending_rows = []
+        try:
+            os.remove(PENDING_ATTENDANCE_FILE)
+        except FileNotFoundError:
+            pass
+    st.session_state.pending_rows_mtime = None
+
+def parse_times_bulk(series):
+    """Parse a Series of 'HH:MM:SS' strings to time objects in one vectorized pass (NaT where unparseable).
+    Values in other formats fall back to pandas' per-element parser."""
+    series = pd.Series(series, dtype='string')
+    parsed = pd.to_datetime(series, format='%H:%M:%S', errors='coerce')
+    retry = parsed.isna() & series.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(series[retry], format='mixed', errors='coerce')
+    return parsed.dt.time
 
 # --- LOGIN ---
 def login(username, password):
     """Authenticates a user."""
+    users = st.session_state.users
     if username in users and users[username]['password'] == hash_password(password):
         return True, users[username]['role']
     return False, None
@@ -106,10 +363,25 @@ def login(username, password):
 # --- DASHBOARDS ---
 def show_owner_dashboard():
     """Displays the main owner dashboard with horizontal buttons."""
-    global attendance_df
-    
     st.title("Owner Dashboard")
+    owner_action_area()
+
+    # Always show the full attendance sheet at the bottom
+    st.markdown("---")
+    attendance_sheet_area()
     
+    # Logout button
+    if st.button("Logout"):
+        flush_pending_rows()
+        flush_users()
+        st.session_state.logged_in = False
+        st.session_state.owner_action = None
+        st.rerun()
+
+@fragment
+def owner_action_area():
+    """Action buttons and the selected page. As a fragment, clicks here rerun only this area,
+    not the sheet below; pages that change data call st.rerun() to refresh everything."""
     # Horizontal button layout
     cols = st.columns(6)
     with cols[0]:
@@ -152,25 +424,18 @@ def show_owner_dashboard():
         # Do nothing, the view is shown below
         pass
 
-    # Always show the full attendance sheet at the bottom
-    st.markdown("---")
+@fragment
+def attendance_sheet_area():
+    """The full attendance sheet, rendered in its own fragment."""
     view_attendance()
-    
-    # Logout button
-    if st.button("Logout"):
-        st.session_state.logged_in = False
-        st.session_state.owner_action = None
-        st.rerun()
 
 def show_staff_dashboard(username):
     """Displays the staff dashboard."""
     st.title(f"Welcome, {username}")
     st.subheader("Your Attendance Records")
-    df = attendance_df[attendance_df['username'] == username].copy()
-    # Make sure date is readable
+    df = staff_slice(username)
     if not df.empty:
-        df['date'] = pd.to_datetime(df['date'], errors='coerce').dt.date
-        st.dataframe(df)
+        st.dataframe(df, column_config=DATE_COLUMN_CONFIG)
     else:
         st.info("No attendance records yet.")
         
@@ -182,6 +447,7 @@ def show_staff_dashboard(username):
 def add_staff():
     """Form to add a new staff member."""
     st.subheader("Add New Staff")
+    users = st.session_state.users
     with st.form("add_staff_form"):
         new_username = st.text_input("Username")
         new_password = st.text_input("Password", type="password")
@@ -194,7 +460,7 @@ def add_staff():
             st.error("User already exists")
         else:
             users[new_username] = {"password": hash_password(new_password), "role": "staff"}
-            save_users(users)
+            commit_users(users)
             st.success(f"Staff {new_username} added!")
             st.session_state.owner_action = "view_all"
             st.rerun()
@@ -202,14 +468,15 @@ def add_staff():
 def remove_staff():
     """Form to remove a staff member."""
     st.subheader("Remove Staff")
-    staff_users = [u for u,d in users.items() if d.get("role") == "staff"]
+    users = st.session_state.users
+    staff_users = st.session_state.by_role['staff']
     if not staff_users:
         st.info("No staff to remove")
         return
     selected = st.selectbox("Select Staff to Remove", staff_users)
     if st.button("Remove Selected Staff"):
         del users[selected]
-        save_users(users)
+        commit_users(users)
         st.success(f"Removed staff {selected}")
         st.session_state.owner_action = "view_all"
         st.rerun()
@@ -217,10 +484,8 @@ def remove_staff():
 # --- ATTENDANCE MANAGEMENT ---
 def mark_attendance_page():
     """Form to mark new attendance."""
-    global attendance_df
-    
     st.subheader("Mark New Attendance")
-    staff_members = [u for u, d in users.items() if d.get('role') == 'staff']
+    staff_members = st.session_state.by_role['staff']
     if not staff_members:
         st.warning("No staff members available.")
         return
@@ -234,45 +499,37 @@ def mark_attendance_page():
         submit = st.form_submit_button("Submit")
 
     if submit:
-        # Ensure date column is datetime-like before using .dt
-        ensure_date_column()
-
-        # Convert selected_date to a datetime.date for comparison
+        # Look up an existing record for this staff member and day
         selected_date_only = selected_date  # already a datetime.date from st.date_input
-        mask_user = attendance_df['username'] == selected_staff
-        # Safe usage of .dt.date because ensure_date_column() made 'date' datetimelike
-        try:
-            mask_date = attendance_df['date'].dt.date == selected_date_only
-        except Exception:
-            # Fallback: create mask of False (no matches)
-            mask_date = pd.Series([False] * len(attendance_df), index=attendance_df.index)
-
-        existing_indices = attendance_df[mask_user & mask_date].index.tolist()
+        key = (selected_staff, selected_date_only.toordinal())
+        idx = st.session_state.idx_map.get(key)
         
-        if len(existing_indices) > 0:
-            idx = existing_indices[0]
-            attendance_df.at[idx, 'check_in_time'] = check_in_time.strftime("%H:%M:%S")
-            attendance_df.at[idx, 'check_out_time'] = check_out_time.strftime("%H:%M:%S")
-            attendance_df.at[idx, 'is_present'] = is_present
+        if idx is not None:
+            attendance_df = attendance_frame()
+            attendance_df.loc[idx, EDITABLE_COLUMNS] = [
+                check_in_time.strftime("%H:%M:%S"), check_out_time.strftime("%H:%M:%S"), is_present]
+            commit_attendance(attendance_df, usernames=[selected_staff])
             st.success(f"Updated attendance for {selected_staff}")
         else:
-            new = pd.DataFrame([{
+            # New rows go to the pending buffer; no full-frame concat or rewrite per mark
+            new_idx = len(st.session_state.attendance_df) + len(st.session_state.pending_rows)
+            buffer_attendance_row({
                 'username': selected_staff,
-                'date': pd.to_datetime(selected_date_only),
+                'date': pd.Timestamp(selected_date_only),
                 'check_in_time': check_in_time.strftime("%H:%M:%S"),
                 'check_out_time': check_out_time.strftime("%H:%M:%S"),
                 'is_present': is_present
-            }])
-            attendance_df = pd.concat([attendance_df, new], ignore_index=True)
+            })
+            st.session_state.idx_map[key] = new_idx
+            st.session_state.user_rows.setdefault(selected_staff, []).append(new_idx)
             st.success(f"Marked attendance for {selected_staff}")
             
-        save_attendance_data(attendance_df)
         st.session_state.owner_action = "view_all"
         st.rerun()
 
 def edit_attendance_page():
     """Page to edit existing attendance records."""
-    global attendance_df
+    attendance_df = attendance_frame()
 
     st.subheader("Edit Existing Attendance Records")
 
@@ -280,19 +537,13 @@ def edit_attendance_page():
         st.info("No records to edit.")
         return
 
-    # Ensure datetime for 'date'
-    ensure_date_column()
-    
     # Sort and build readable options
     attendance_df_sorted = attendance_df.sort_values(by='date', ascending=False)
-    edit_options = []
-    for i, row in attendance_df_sorted.iterrows():
-        date_val = pd.to_datetime(row.get('date', pd.NaT), errors='coerce')
-        date_str = date_val.strftime('%Y-%m-%d') if not pd.isna(date_val) else 'N/A'
-        ci = row.get('check_in_time', '') if pd.notna(row.get('check_in_time', '')) else ''
-        co = row.get('check_out_time', '') if pd.notna(row.get('check_out_time', '')) else ''
-        uname = row.get('username', '')
-        edit_options.append(f"{i} | {uname} | {date_str} | In: {ci} | Out: {co}")
+    d = attendance_df_sorted['date'].dt.strftime('%Y-%m-%d').fillna('N/A')
+    ci = attendance_df_sorted['check_in_time'].fillna('').astype(str)
+    co = attendance_df_sorted['check_out_time'].fillna('').astype(str)
+    u = attendance_df_sorted['username'].astype(str)
+    edit_options = (attendance_df_sorted.index.astype(str) + ' | ' + u + ' | ' + d + ' | In: ' + ci + ' | Out: ' + co).tolist()
 
     selected_record = st.selectbox("Select a record", ["---"] + edit_options)
 
@@ -310,28 +561,24 @@ def edit_attendance_page():
         record = attendance_df.loc[idx]
 
         with st.form(key=f"edit_form_{idx}"):
-            new_check_in = st.time_input(
-                "Check-in Time",
-                value=parse_time_str_to_time(record.get('check_in_time', ''))
-            )
-            new_check_out = st.time_input(
-                "Check-out Time",
-                value=parse_time_str_to_time(record.get('check_out_time', ''))
-            )
-            new_is_present = st.checkbox("Present", value=bool(record.get('is_present', False)))
+            now = datetime.now(INDIA_TIMEZONE).time()
+            ci_val, co_val = (t if pd.notna(t) else now for t in parse_times_bulk(record[['check_in_time', 'check_out_time']]))
+            new_check_in = st.time_input("Check-in Time", value=ci_val)
+            new_check_out = st.time_input("Check-out Time", value=co_val)
+            present_val = record.get('is_present', False)
+            new_is_present = st.checkbox("Present", value=bool(present_val) if pd.notna(present_val) else False)
             update = st.form_submit_button("Update Record")
         if update:
-            attendance_df.at[idx, 'check_in_time'] = new_check_in.strftime("%H:%M:%S")
-            attendance_df.at[idx, 'check_out_time'] = new_check_out.strftime("%H:%M:%S")
-            attendance_df.at[idx, 'is_present'] = new_is_present
-            save_attendance_data(attendance_df)
+            attendance_df.loc[idx, EDITABLE_COLUMNS] = [
+                new_check_in.strftime("%H:%M:%S"), new_check_out.strftime("%H:%M:%S"), new_is_present]
+            commit_attendance(attendance_df, usernames=[record['username']])
             st.success("Record updated")
             st.session_state.owner_action = "view_all"
             st.rerun()
 
 def delete_attendance_page():
     """Page to delete attendance records."""
-    global attendance_df
+    attendance_df = attendance_frame()
     
     st.subheader("Delete Attendance Records")
     
@@ -339,29 +586,21 @@ def delete_attendance_page():
         st.info("No records to delete.")
         return
 
-    # Ensure datetime for 'date'
-    ensure_date_column()
-
-    def format_row(i):
-        try:
-            d = attendance_df.loc[i, 'date']
-            d = pd.to_datetime(d, errors='coerce')
-            d_str = d.strftime('%Y-%m-%d') if not pd.isna(d) else 'N/A'
-        except Exception:
-            d_str = 'N/A'
-        uname = attendance_df.loc[i, 'username'] if 'username' in attendance_df.columns else ''
-        return f"{uname} | {d_str}"
+    # Build every label in one vectorized pass; format_func just indexes into it
+    row_labels = attendance_df['username'].astype(str) + ' | ' + attendance_df['date'].dt.strftime('%Y-%m-%d').fillna('N/A')
 
     delete_indices = st.multiselect(
         "Select records to delete",
         options=list(attendance_df.index),
-        format_func=lambda i: format_row(i)
+        format_func=lambda i: row_labels[i]
     )
     if delete_indices and st.button("Delete Selected Records"):
+        affected_users = attendance_df.loc[delete_indices, 'username'].unique().tolist()
         attendance_df.drop(delete_indices, inplace=True)
         # Optionally reset index to keep things tidy
         attendance_df.reset_index(drop=True, inplace=True)
-        save_attendance_data(attendance_df)
+        index_attendance(attendance_df)
+        commit_attendance(attendance_df, usernames=affected_users)
         st.success("Selected records deleted")
         st.session_state.owner_action = "view_all"
         st.rerun()
@@ -374,13 +613,11 @@ def show_warnings():
 def view_attendance():
     """Displays the full attendance sheet."""
     st.subheader("Full Attendance Sheet")
+    attendance_df = attendance_frame()
     if attendance_df.empty:
         st.info("No attendance records found.")
     else:
-        df_display = attendance_df.copy()
-        # Make date readable
-        df_display['date'] = pd.to_datetime(df_display['date'], errors='coerce').dt.date
-        st.dataframe(df_display)
+        st.dataframe(attendance_df, column_config=DATE_COLUMN_CONFIG)
 
 # --- MAIN APP FLOW ---
 def main():
@@ -396,6 +633,8 @@ def main():
         st.session_state.username = None
     if 'owner_action' not in st.session_state:
         st.session_state.owner_action = "view_all" # Default view for owner
+    # The login screen only needs users; attendance is read once someone is logged in
+    sync_session_data(include_attendance=st.session_state.logged_in)
 
     if not st.session_state.logged_in:
         st.subheader("Login")
@@ -1,129 +1,325 @@
 import streamlit as st
 import pandas as pd
 import os
+import shutil
+import time
+import atexit
+import logging
+import queue
+import threading
+import pyarrow as pa
+import pyarrow.dataset as pa_ds
 from PIL import Image, ImageDraw, ImageFont
 from datetime import datetime
 import pytz
 import qrcode
-from pyzbar.pyzbar import decode
 import numpy as np
+import cv2
 import json
+try:
+    import orjson
+except ImportError:  # optional speedup; fall back to the stdlib parser
+    orjson = None
 
 # ---------------- CONFIG ----------------
-USERS_FILE = "users.csv"
-ATTENDANCE_FILE = "attendance.csv"
-WARNINGS_FILE = "warnings.csv"
+USERS_FILE = "users.parquet"
+ATTENDANCE_DIR = "attendance"  # Parquet dataset, one date=YYYY-MM-DD partition per check-in day
+WARNINGS_DIR = "warnings"  # Parquet dataset, one file per batch of warnings
 PHOTOS_DIR = "photos"
 QR_DIR = "qrcodes"
 SHOP_INFO_FILE = "shop_info.json"
 
+USERS_COLUMNS = ["username","password","role","photo_path","qr_path"]
+# Times are naive timestamps in shop-local time
+ATTENDANCE_SCHEMA = pa.schema([("username",pa.string()),("check_in_time",pa.timestamp("ns")),("check_out_time",pa.timestamp("ns"))])
+WARNINGS_SCHEMA = pa.schema([("username",pa.string()),("warning",pa.string()),("date_time",pa.timestamp("ns"))])
+ATTENDANCE_PARTITIONING = pa_ds.partitioning(pa.schema([("date",pa.string())]),flavor="hive")
+
+# st.fragment was st.experimental_fragment before Streamlit 1.37
+fragment = getattr(st, "fragment", None) or st.experimental_fragment
+
 os.makedirs(PHOTOS_DIR, exist_ok=True)
 os.makedirs(QR_DIR, exist_ok=True)
 
+_QR = cv2.QRCodeDetector()
+
 # ---------------- SESSION STATE ----------------
 if "page" not in st.session_state: st.session_state.page = "login"
 if "logged_in" not in st.session_state: st.session_state.logged_in = False
 if "username" not in st.session_state: st.session_state.username = ""
 if "role" not in st.session_state: st.session_state.role = ""
+# Bumped after each save so the attendance editor starts fresh from the saved frame
+if "att_editor_rev" not in st.session_state: st.session_state.att_editor_rev = 0
 
 # ---------------- HELPER FUNCTIONS ----------------
+def read_table(path, all_columns):
+    """Reads a single-file Parquet store, or an empty frame if it doesn't exist yet."""
+    if os.path.exists(path):
+        return pd.read_parquet(path, engine="pyarrow")
+    return pd.DataFrame(columns=all_columns)
+
+def read_dataset(path, schema, order_by):
+    """Reads every fragment of a Parquet dataset directory into one frame sorted by `order_by`."""
+    if not os.path.isdir(path): return schema.empty_table().to_pandas()
+    df = pa_ds.dataset(path, format="parquet", schema=schema).to_table().to_pandas()
+    return df.sort_values(order_by, kind="stable", ignore_index=True)
+
+def write_dataset(df, path, schema, partitioning=None, mode="replace"):
+    """Writes df as Parquet under the `path` directory. "replace" rewrites the whole store,
+    "partitions" replaces just the partitions df has rows in, and "append" adds df as new files."""
+    if mode=="replace": shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+    table = pa.Table.from_pandas(df.reindex(columns=schema.names), schema=schema, preserve_index=False)
+    pa_ds.write_dataset(table, path, format="parquet", partitioning=partitioning,
+                        basename_template=f"part-{time.time_ns()}-{{i}}.parquet",
+                        existing_data_behavior="overwrite_or_ignore" if mode=="append" else "delete_matching",
+                        file_options=pa_ds.ParquetFileFormat().make_write_options(compression="zstd"))
+
+def _file_mtime(path):
+    """Returns the file's modification time in ns, or None if it doesn't exist.
+    For a dataset directory, returns the (path, mtime) of every file under it, so any write changes it."""
+    if os.path.isdir(path):
+        return tuple(sorted((os.path.join(root, f), os.stat(os.path.join(root, f)).st_mtime_ns)
+                            for root, _, files in os.walk(path) for f in files))
+    try: return os.stat(path).st_mtime_ns
+    except FileNotFoundError: return None
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _users_indexed(mtime):
+    """Users indexed by username; `mtime` keys the cache so a save is picked up on the next read."""
+    return read_table(USERS_FILE, USERS_COLUMNS).set_index("username")
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _load_attendance_shared(mtime):
+    """Attendance is the largest frame, so it is shared rather than copied per call. Copy before mutating."""
+    return read_dataset(ATTENDANCE_DIR, ATTENDANCE_SCHEMA, "check_in_time")
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _rows_by_user(mtime):
+    """Positions of each user's attendance rows, oldest check-in first."""
+    return _load_attendance_shared(mtime).groupby("username",sort=False).indices
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _load_warnings(mtime): return read_dataset(WARNINGS_DIR, WARNINGS_SCHEMA, "date_time")
+
+def write_table(df, path): df.to_parquet(path, engine="pyarrow", compression="zstd", index=False)
+
+@st.cache_resource(show_spinner=False)
+def _write_queue():
+    """One background writer per server process, so saves don't block the request that makes them."""
+    q = queue.Queue()
+    def worker():
+        while True:
+            write, args = q.get()
+            try: write(*args)
+            except Exception: logging.exception("Background write failed")
+            finally: q.task_done()
+    threading.Thread(target=worker, name="write-behind", daemon=True).start()
+    atexit.register(q.join)
+    return q
+
+def write_behind(write, *args): _write_queue().put((write, args))
+
+def _store_mtime(path):
+    """mtime of a data store once every queued write has landed, so reads never see stale data."""
+    _write_queue().join()
+    return _file_mtime(path)
+
+def migrate_legacy_files():
+    """One-time conversion of older stores (CSV files, then single Parquet files) to the current layout."""
+    if not os.path.exists(USERS_FILE) and os.path.exists("users.csv"):
+        save_users(pd.read_csv("users.csv", dtype=str, keep_default_na=False).set_index("username"))
+    for path, schema, save in ((ATTENDANCE_DIR, ATTENDANCE_SCHEMA, save_attendance), (WARNINGS_DIR, WARNINGS_SCHEMA, save_warnings)):
+        if os.path.isdir(path): continue
+        if os.path.exists(path+".parquet"):
+            save(pd.read_parquet(path+".parquet", engine="pyarrow"))
+        elif os.path.exists(path+".csv"):
+            df = pd.read_csv(path+".csv", dtype=str, keep_default_na=False)
+            for f in schema:
+                if pa.types.is_timestamp(f.type): df[f.name] = pd.to_datetime(df[f.name], errors="coerce")
+            save(df)
+
 def load_users():
-    if os.path.exists(USERS_FILE):
-        return pd.read_csv(USERS_FILE)
-    return pd.DataFrame(columns=["username","password","role","photo_path","qr_path"])
+    """Users frame indexed by username, so a user's row is users.loc[username]."""
+    return _users_indexed(_store_mtime(USERS_FILE))
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _users_dict(mtime):
+    """Users keyed by username for O(1) lookups; `mtime` keys the cache."""
+    return _users_indexed(mtime).to_dict("index")
+
+def load_users_dict(): return _users_dict(_store_mtime(USERS_FILE))
 
-def save_users(df): df.to_csv(USERS_FILE,index=False)
+def save_users(users): write_behind(write_table, users.reset_index(), USERS_FILE)
 
-def load_attendance():
-    if os.path.exists(ATTENDANCE_FILE):
-        return pd.read_csv(ATTENDANCE_FILE)
-    return pd.DataFrame(columns=["username","check_in_time","check_out_time"])
+def load_attendance(columns=None):
+    df = _load_attendance_shared(_store_mtime(ATTENDANCE_DIR))
+    return df[columns] if columns else df
 
-def save_attendance(df): df.to_csv(ATTENDANCE_FILE,index=False)
+def load_user_attendance(username):
+    """Just `username`'s attendance rows, taken by position instead of masking the whole frame."""
+    mtime = _store_mtime(ATTENDANCE_DIR)
+    df = _load_attendance_shared(mtime)
+    rows = _rows_by_user(mtime).get(username)
+    return df.take(rows) if rows is not None else df.iloc[:0]
 
-def load_warnings():
-    if os.path.exists(WARNINGS_FILE):
-        return pd.read_csv(WARNINGS_FILE)
-    return pd.DataFrame(columns=["username","warning","date_time"])
+def _day_keys(df):
+    """Partition key of each attendance row: its check-in date, or "unknown" without one."""
+    return df["check_in_time"].dt.strftime("%Y-%m-%d").fillna("unknown")
 
-def save_warnings(df): df.to_csv(WARNINGS_FILE,index=False)
+def save_attendance(df, mode="replace"):
+    write_behind(write_dataset, df.assign(date=_day_keys(df)), ATTENDANCE_DIR, ATTENDANCE_SCHEMA.append(pa.field("date",pa.string())), ATTENDANCE_PARTITIONING, mode)
+
+def append_attendance(rows): save_attendance(pd.DataFrame(rows), mode="append")
+
+def load_warnings(columns=None):
+    df = _load_warnings(_store_mtime(WARNINGS_DIR))
+    return df[columns] if columns else df
+
+def save_warnings(df, mode="replace"): write_behind(write_dataset, df.copy(), WARNINGS_DIR, WARNINGS_SCHEMA, None, mode)
+
+def append_warnings(rows): save_warnings(pd.DataFrame(rows), mode="append")
 
 def load_shop_info():
-    if os.path.exists(SHOP_INFO_FILE):
-        with open(SHOP_INFO_FILE,"r") as f: return json.load(f)
-    return {"shop_name":"My Shop","shop_logo_path":""}
+    """Shop info, parsed once per session and file version."""
+    mtime = _file_mtime(SHOP_INFO_FILE)
+    cached = st.session_state.get("_shop_info")
+    if cached and cached[0]==mtime: return cached[1]
+    if mtime is None: info = {"shop_name":"My Shop","shop_logo_path":""}
+    else:
+        with open(SHOP_INFO_FILE,"rb") as f: data = f.read()
+        info = orjson.loads(data) if orjson else json.loads(data)
+    st.session_state["_shop_info"] = (mtime,info)
+    return info
 
 def save_shop_info(shop_name,shop_logo_path):
-    with open(SHOP_INFO_FILE,"w") as f:
-        json.dump({"shop_name":shop_name,"shop_logo_path":shop_logo_path},f)
+    info = {"shop_name":shop_name,"shop_logo_path":shop_logo_path}
+    with open(SHOP_INFO_FILE,"wb") as f: f.write(orjson.dumps(info) if orjson else json.dumps(info).encode())
 
 def ensure_default_owner():
-    users = load_users()
-    if "owner" not in users["username"].values:
-        default_owner = pd.DataFrame([{
-            "username":"owner","password":"owner123",
-            "role":"owner","photo_path":"","qr_path":""
-        }])
-        users = pd.concat([users,default_owner],ignore_index=True)
+    if "owner" not in load_users_dict():
+        users = load_users()
+        users.loc["owner"] = {"password":"owner123","role":"owner","photo_path":"","qr_path":""}
         save_users(users)
         generate_qr_code("owner")
 
+@st.cache_data(show_spinner=False, max_entries=256)
+def qr_matrix(username):
+    """QR modules for `username` (True = dark), quiet-zone border included."""
+    qr = qrcode.QRCode(border=4)
+    qr.add_data(username)
+    qr.make(fit=True)
+    return np.array(qr.get_matrix(),dtype=bool)
+
+def qr_image(username, box_size=10):
+    """Rasterizes the cached QR matrix straight into a grayscale image, `box_size` pixels per module."""
+    px = np.where(qr_matrix(username),0,255).astype(np.uint8)
+    return Image.fromarray(px.repeat(box_size,axis=0).repeat(box_size,axis=1))
+
 def generate_qr_code(username):
     qr_path = os.path.join(QR_DIR,f"{username}.png")
     if not os.path.exists(qr_path):
-        img = qrcode.make(username)
-        img.save(qr_path)
+        qr_image(username).save(qr_path)
     return qr_path
 
+@st.cache_resource(show_spinner=False)
+def _font(): return ImageFont.load_default()
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def _resized_image(path, mtime, size):
+    """Opens and resizes an image once per file version. Shared between reruns, so only paste from it."""
+    return Image.open(path).resize(size)
+
+def resized_image(path, size):
+    """Cached resize of the image at `path`, or None if there is no such file."""
+    mtime = _file_mtime(path) if path else None
+    return _resized_image(path, mtime, size) if mtime is not None else None
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _card_template(shop_name, logo_path, logo_mtime):
+    """Blank ID card with the shop logo and name already drawn. Shared, so copy it before drawing."""
+    card = Image.new("RGB",(400,200),"white")
+    logo_img = resized_image(logo_path,(50,50))
+    if logo_img is not None:
+        card.paste(logo_img,(10,10))
+    ImageDraw.Draw(card).text((70,10),shop_name,fill="black",font=_font())
+    return card
+
+def new_id_card(shop_info):
+    """A fresh copy of the shop's ID-card template, ready for the holder's details."""
+    logo_path = shop_info.get("shop_logo_path")
+    return _card_template(shop_info.get("shop_name","My Shop"),logo_path,_file_mtime(logo_path) if logo_path else None).copy()
+
 def mark_attendance(username):
-    df = load_attendance()
+    mtime = _store_mtime(ATTENDANCE_DIR)
+    df = _load_attendance_shared(mtime)
+    rows = _rows_by_user(mtime).get(username)
+    last = df.index[rows[-1]] if rows is not None else None
     india_time = pytz.timezone("Asia/Kolkata")
     now = datetime.now(india_time)
-    user_records = df[df["username"]==username]
-    if user_records.empty or pd.notna(user_records.iloc[-1]["check_out_time"]):
-        df = pd.concat([df,pd.DataFrame([{
+    stamp = pd.Timestamp(now.replace(tzinfo=None,microsecond=0))
+    if last is None or pd.notna(df.at[last,"check_out_time"]):
+        append_attendance([{
             "username":username,
-            "check_in_time":now.strftime("%Y-%m-%d %H:%M:%S"),
-            "check_out_time":""
-        }])],ignore_index=True)
-        save_attendance(df)
+            "check_in_time":stamp,
+            "check_out_time":pd.NaT
+        }])
         st.success(f"{username} checked in at {now.strftime('%I:%M %p')}")
     else:
-        df.loc[df["username"]==username,"check_out_time"]=now.strftime("%Y-%m-%d %H:%M:%S")
-        save_attendance(df)
+        # Close the open check-in; only its day's partition is rewritten
+        keys = _day_keys(df)
+        day = df[keys==keys[last]].copy()
+        day.at[last,"check_out_time"]=stamp
+        save_attendance(day, mode="partitions")
         st.info(f"{username} checked out at {now.strftime('%I:%M %p')}")
 
-def scan_qr_image(uploaded_file):
-    img = Image.open(uploaded_file)
-    decoded_objects = decode(img)
-    if decoded_objects:
-        return decoded_objects[0].data.decode("utf-8")
+def _qr_candidates(img):
+    """Yields the image, then cleaned-up variants to retry hard-to-read codes with."""
+    yield img
+    yield cv2.threshold(img,0,255,cv2.THRESH_BINARY+cv2.THRESH_OTSU)[1]
+    yield 255-img
+    yield cv2.createCLAHE(clipLimit=2.0,tileGridSize=(8,8)).apply(img)
+    yield cv2.resize(img,None,fx=2,fy=2,interpolation=cv2.INTER_CUBIC)
+
+def decode_qr(img):
+    """Returns the text of the first QR code found in a grayscale image, or None."""
+    if img is None: return None
+    for candidate in _qr_candidates(img):
+        ok, decoded, _, _ = _QR.detectAndDecodeMulti(candidate)
+        if ok:
+            text = next((d for d in decoded if d), None)
+            if text: return text
     return None
 
+def _decode_upload(uploaded_file):
+    """Decodes the uploaded PNG/JPEG bytes straight to a grayscale array."""
+    return cv2.imdecode(np.frombuffer(uploaded_file.getvalue(),np.uint8),cv2.IMREAD_GRAYSCALE)
+
+def scan_qr_image(uploaded_file):
+    return decode_qr(_decode_upload(uploaded_file))
+
 def scan_qr_camera(label="Scan QR"):
     qr_image = st.camera_input(label)
     if qr_image:
-        img = Image.open(qr_image).convert("RGB")
-        decoded_objects = decode(np.array(img))
-        if decoded_objects:
-            return decoded_objects[0].data.decode("utf-8")
+        return decode_qr(_decode_upload(qr_image))
     return None
 
 # ---------------- LOGIN ----------------
 def login_page():
     st.title("🔐 Smart Attendance System")
     st.subheader("Login with Username/Password")
-    username = st.text_input("Username")
-    password = st.text_input("Password",type="password")
-    if st.button("Login"):
-        users = load_users()
-        if username in users["username"].values:
-            user = users[users["username"]==username].iloc[0]
-            if user["password"]==password:
-                st.session_state.logged_in=True
-                st.session_state.username=username
-                st.session_state.role=user["role"]
-                st.session_state.page="dashboard"
+    # A form reruns only on submit, not on every keystroke
+    with st.form("login_form"):
+        username = st.text_input("Username")
+        password = st.text_input("Password",type="password")
+        submitted = st.form_submit_button("Login")
+    if submitted:
+        user = load_users_dict().get(username)
+        if user and user["password"]==password:
+            st.session_state.logged_in=True
+            st.session_state.username=username
+            st.session_state.role=user["role"]
+            st.session_state.page="dashboard"
         else: st.error("Invalid credentials")
     st.markdown("---")
     st.subheader("Or Login with QR Code")
@@ -133,15 +329,16 @@ def login_page():
 def qr_login_page():
     st.title("🔑 Login via QR Code")
     st.write("Upload QR image or scan via camera")
-    qr_file = st.file_uploader("Upload QR Code",type=["png","jpg"])
+    with st.form("qr_login_form"):
+        qr_file = st.file_uploader("Upload QR Code",type=["png","jpg"])
+        qr_submitted = st.form_submit_button("Login with QR")
     qr_camera_button = st.button("Scan QR via Camera")
     username=None
-    if qr_file: username = scan_qr_image(qr_file)
+    if qr_submitted and qr_file: username = scan_qr_image(qr_file)
     elif qr_camera_button: username = scan_qr_camera("Scan QR to login")
     if username:
-        users = load_users()
-        if username in users["username"].values:
-            user = users[users["username"]==username].iloc[0]
+        user = load_users_dict().get(username)
+        if user:
             st.session_state.logged_in=True
             st.session_state.username=username
             st.session_state.role=user["role"]
@@ -150,6 +347,120 @@ def qr_login_page():
     if st.button("Back to Login Page"):
         st.session_state.page="login"
 
+# ---------------- OWNER PAGES ----------------
+# Each page with widgets is a fragment, so interacting with it reruns just that page
+@fragment
+def owner_mark_attendance():
+    st.write("📷 Mark Attendance via QR")
+    qr_file = st.file_uploader("Upload QR",type=["png","jpg"],key="owner_att")
+    if qr_file:
+        uname = scan_qr_image(qr_file)
+        if uname: mark_attendance(uname)
+    if st.button("Scan QR via Camera"):
+        uname = scan_qr_camera("Owner Scan QR")
+        if uname: mark_attendance(uname)
+
+@fragment
+def owner_edit_attendance():
+    att_df = load_attendance()
+    if not att_df.empty:
+        # One editor for the whole frame; rows can be edited, added and deleted in place
+        edited = st.data_editor(att_df,num_rows="dynamic",hide_index=True,key=f"att_editor{st.session_state.att_editor_rev}",column_config={
+            "check_in_time":st.column_config.DatetimeColumn("Check-in",format="YYYY-MM-DD HH:mm:ss"),
+            "check_out_time":st.column_config.DatetimeColumn("Check-out",format="YYYY-MM-DD HH:mm:ss")})
+        if st.button("Save Changes"):
+            if edited.equals(att_df): st.info("No changes to save.")
+            else:
+                save_attendance(edited)
+                st.session_state.att_editor_rev += 1
+                st.success("Saved!")
+    else: st.info("No attendance records yet.")
+
+@fragment
+def owner_add_staff():
+    st.write("➕ Add New Staff")
+    with st.form("add_staff_form"):
+        uname = st.text_input("Username",key="add_user")
+        pwd = st.text_input("Password",type="password",key="add_pwd")
+        photo = st.file_uploader("Photo",type=["png","jpg"],key="add_photo")
+        submitted = st.form_submit_button("Add Staff")
+    if submitted:
+        if uname and pwd:
+            users = load_users()
+            if uname in users.index: st.warning("Username exists!")
+            else:
+                photo_path=""
+                if photo: 
+                    photo_path = os.path.join(PHOTOS_DIR,f"{uname}.png")
+                    with open(photo_path,"wb") as f: f.write(photo.read())
+                qr_path = generate_qr_code(uname)
+                users.loc[uname] = {"password":pwd,"role":"staff","photo_path":photo_path,"qr_path":qr_path}
+                save_users(users)
+                st.success(f"Staff '{uname}' added!")
+
+@fragment
+def owner_remove_staff():
+    users = load_users()
+    staff_list = users.index[users["role"]=="staff"].tolist()
+    if staff_list:
+        remove = st.selectbox("Select Staff to Remove",staff_list)
+        if st.button("Remove"):
+            save_users(users.drop(remove))
+            st.success(f"Staff '{remove}' removed!")
+    else: st.info("No staff found.")
+
+@fragment
+def owner_warnings():
+    users = load_users()
+    staff_list = users.index[users["role"]=="staff"].tolist()
+    if staff_list:
+        with st.form("warning_form"):
+            staff_warn = st.selectbox("Select Staff",staff_list)
+            text = st.text_input("Warning")
+            submitted = st.form_submit_button("Give Warning")
+        if submitted:
+            if text:
+                append_warnings([{"username":staff_warn,"warning":text,"date_time":pd.Timestamp(datetime.now().replace(microsecond=0))}])
+                st.success("Warning sent")
+
+@fragment
+def owner_shop_info():
+    shop_info = load_shop_info()
+    with st.form("shop_info_form"):
+        name = st.text_input("Shop Name",value=shop_info["shop_name"])
+        logo = st.file_uploader("Shop Logo",type=["png","jpg"])
+        submitted = st.form_submit_button("Save Shop Info")
+    if submitted:
+        logo_path = shop_info.get("shop_logo_path","")
+        if logo:
+            logo_path=os.path.join(PHOTOS_DIR,"shop_logo.png")
+            with open(logo_path,"wb") as f: f.write(logo.read())
+        save_shop_info(name,logo_path)
+        st.success("Shop Info Saved")
+
+def owner_id_card():
+    st.write("Owner ID Card")
+    shop_info = load_shop_info()
+    qr_path = generate_qr_code("owner")
+    id_card = new_id_card(shop_info)
+    draw = ImageDraw.Draw(id_card)
+    font = _font()
+    draw.text((10,70),"Owner: owner",fill="black",font=font)
+    qr_img = resized_image(qr_path,(80,80))
+    if qr_img is not None:
+        id_card.paste(qr_img,(300,100))
+    st.image(id_card)
+
+OWNER_PAGES = {
+    "Mark Attendance":owner_mark_attendance,
+    "Edit/Delete Attendance":owner_edit_attendance,
+    "Add Staff":owner_add_staff,
+    "Remove Staff":owner_remove_staff,
+    "Warnings":owner_warnings,
+    "Shop Info":owner_shop_info,
+    "Owner ID Card":owner_id_card,
+}
+
 # ---------------- DASHBOARD ----------------
 def dashboard():
     role = st.session_state.role
@@ -157,163 +468,48 @@ def dashboard():
     st.sidebar.title(f"Welcome, {username}")
     if st.sidebar.button("Logout"): logout()
     
-    shop_info = load_shop_info()
-    
     if role=="owner":
         st.subheader("Owner Dashboard")
-        menu = st.sidebar.radio("Select Feature:",["Mark Attendance","Edit/Delete Attendance","Add Staff","Remove Staff","Warnings","Shop Info","Owner ID Card"])
-        
-        if menu=="Mark Attendance":
-            st.write("📷 Mark Attendance via QR")
-            qr_file = st.file_uploader("Upload QR",type=["png","jpg"],key="owner_att")
-            if qr_file:
-                uname = scan_qr_image(qr_file)
-                if uname: mark_attendance(uname)
-            if st.button("Scan QR via Camera"):
-                uname = scan_qr_camera("Owner Scan QR")
-                if uname: mark_attendance(uname)
-        
-        elif menu=="Edit/Delete Attendance":
-            att_df = load_attendance()
-            if not att_df.empty:
-                att_df["check_in_time"]=pd.to_datetime(att_df["check_in_time"])
-                att_df["check_out_time"]=pd.to_datetime(att_df["check_out_time"])
-                for i,row in att_df.iterrows():
-                    cols = st.columns([2,2,2,1,1])
-                    cols[0].write(row["username"])
-                    ci = cols[1].date_input("Check-in",value=row["check_in_time"].date() if pd.notna(row["check_in_time"]) else datetime.today(),key=f"ci{i}")
-                    co = cols[2].date_input("Check-out",value=row["check_out_time"].date() if pd.notna(row["check_out_time"]) else datetime.today(),key=f"co{i}")
-                    if cols[3].button("Update",key=f"up{i}"):
-                        att_df.at[i,"check_in_time"]=datetime.combine(ci,row["check_in_time"].time() if pd.notna(row["check_in_time"]) else datetime.min.time())
-                        att_df.at[i,"check_out_time"]=datetime.combine(co,row["check_out_time"].time() if pd.notna(row["check_out_time"]) else datetime.min.time())
-                        save_attendance(att_df)
-                        st.success("Updated!")
-                    if cols[4].button("Delete",key=f"del{i}"):
-                        att_df = att_df.drop(i)
-                        save_attendance(att_df)
-                        st.success("Deleted!")
-                st.dataframe(att_df)
-            else: st.info("No attendance records yet.")
-        
-        elif menu=="Add Staff":
-            st.write("➕ Add New Staff")
-            uname = st.text_input("Username",key="add_user")
-            pwd = st.text_input("Password",type="password",key="add_pwd")
-            photo = st.file_uploader("Photo",type=["png","jpg"],key="add_photo")
-            if st.button("Add Staff"):
-                if uname and pwd:
-                    users = load_users()
-                    if uname in users["username"].values: st.warning("Username exists!")
-                    else:
-                        photo_path=""
-                        if photo: 
-                            photo_path = os.path.join(PHOTOS_DIR,f"{uname}.png")
-                            with open(photo_path,"wb") as f: f.write(photo.read())
-                        qr_path = generate_qr_code(uname)
-                        new_user = pd.DataFrame([{"username":uname,"password":pwd,"role":"staff","photo_path":photo_path,"qr_path":qr_path}])
-                        users=pd.concat([users,new_user],ignore_index=True)
-                        save_users(users)
-                        st.success(f"Staff '{uname}' added!")
-        
-        elif menu=="Remove Staff":
-            users = load_users()
-            staff_list = users[users["role"]=="staff"]["username"].tolist()
-            if staff_list:
-                remove = st.selectbox("Select Staff to Remove",staff_list)
-                if st.button("Remove"):
-                    users = users[users["username"]!=remove]
-                    save_users(users)
-                    st.success(f"Staff '{remove}' removed!")
-            else: st.info("No staff found.")
-        
-        elif menu=="Warnings":
-            users = load_users()
-            staff_list = users[users["role"]=="staff"]["username"].tolist()
-            if staff_list:
-                staff_warn = st.selectbox("Select Staff",staff_list)
-                text = st.text_input("Warning")
-                if st.button("Give Warning"):
-                    if text:
-                        df = load_warnings()
-                        new = pd.DataFrame([{"username":staff_warn,"warning":text,"date_time":datetime.now().strftime("%Y-%m-%d %H:%M:%S")}])
-                        df=pd.concat([df,new],ignore_index=True)
-                        save_warnings(df)
-                        st.success("Warning sent")
-        
-        elif menu=="Shop Info":
-            name = st.text_input("Shop Name",value=shop_info["shop_name"])
-            logo = st.file_uploader("Shop Logo",type=["png","jpg"])
-            if st.button("Save Shop Info"):
-                logo_path = shop_info.get("shop_logo_path","")
-                if logo:
-                    logo_path=os.path.join(PHOTOS_DIR,"shop_logo.png")
-                    with open(logo_path,"wb") as f: f.write(logo.read())
-                save_shop_info(name,logo_path)
-                st.success("Shop Info Saved")
-        
-        elif menu=="Owner ID Card":
-            st.write("Owner ID Card")
-            shop_info = load_shop_info()
-            qr_path = generate_qr_code("owner")
-            id_card = Image.new("RGB",(400,200),"white")
-            draw = ImageDraw.Draw(id_card)
-            font = ImageFont.load_default()
-            # Shop logo
-            if shop_info.get("shop_logo_path") and os.path.exists(shop_info["shop_logo_path"]):
-                logo_img = Image.open(shop_info["shop_logo_path"]).resize((50,50))
-                id_card.paste(logo_img,(10,10))
-            draw.text((70,10),shop_info.get("shop_name","My Shop"),fill="black",font=font)
-            draw.text((10,70),"Owner: owner",fill="black",font=font)
-            if os.path.exists(qr_path):
-                qr_img = Image.open(qr_path).resize((80,80))
-                id_card.paste(qr_img,(300,100))
-            st.image(id_card)
+        menu = st.sidebar.radio("Select Feature:",list(OWNER_PAGES))
+        OWNER_PAGES[menu]()
 
     else: # Staff
         st.subheader("Staff Dashboard")
         menu = st.sidebar.radio("Select Feature:",["View QR","Attendance History","Warnings","Staff ID Card"])
         if menu=="View QR":
-            users = load_users()
-            data = users[users["username"]==username].iloc[0]
+            data = load_users().loc[username]
             qr_path = data["qr_path"]
             if os.path.exists(qr_path):
                 st.image(qr_path,caption="Your QR Code",width=200)
         elif menu=="Attendance History":
-            df = load_attendance()
-            records = df[df["username"]==username]
+            records = load_user_attendance(username)
             if not records.empty:
-                records["check_in_time"]=pd.to_datetime(records["check_in_time"]).dt.strftime("%d-%b %I:%M %p")
-                records["check_out_time"]=pd.to_datetime(records["check_out_time"],errors="coerce").apply(lambda x:x.strftime("%d-%b %I:%M %p") if pd.notna(x) else "")
+                records["check_in_time"]=records["check_in_time"].dt.strftime("%d-%b %I:%M %p").fillna("")
+                records["check_out_time"]=records["check_out_time"].dt.strftime("%d-%b %I:%M %p").fillna("")
                 st.dataframe(records)
             else: st.info("No records yet.")
         elif menu=="Warnings":
             df = load_warnings()
             warnings = df[df["username"]==username]
             if not warnings.empty:
-                warnings["date_time"]=pd.to_datetime(warnings["date_time"]).dt.strftime("%d-%b %I:%M %p")
+                warnings["date_time"]=warnings["date_time"].dt.strftime("%d-%b %I:%M %p").fillna("")
                 st.dataframe(warnings[["warning","date_time"]])
             else: st.info("No warnings")
         elif menu=="Staff ID Card":
-            users = load_users()
-            data = users[users["username"]==username].iloc[0]
+            data = load_users().loc[username]
             qr_path = data["qr_path"]
             photo_path = data["photo_path"]
             shop_info = load_shop_info()
-            id_card = Image.new("RGB",(400,200),"white")
+            id_card = new_id_card(shop_info)
             draw = ImageDraw.Draw(id_card)
-            font = ImageFont.load_default()
-            # Shop logo
-            if shop_info.get("shop_logo_path") and os.path.exists(shop_info["shop_logo_path"]):
-                logo_img = Image.open(shop_info["shop_logo_path"]).resize((50,50))
-                id_card.paste(logo_img,(10,10))
-            draw.text((70,10),shop_info.get("shop_name","My Shop"),fill="black",font=font)
+            font = _font()
             # Staff photo
-            if photo_path and os.path.exists(photo_path):
-                ph_img = Image.open(photo_path).resize((80,80))
+            ph_img = resized_image(photo_path,(80,80))
+            if ph_img is not None:
                 id_card.paste(ph_img,(10,70))
             draw.text((100,80),f"Name: {username}",fill="black",font=font)
-            if qr_path and os.path.exists(qr_path):
-                qr_img = Image.open(qr_path).resize((80,80))
+            qr_img = resized_image(qr_path,(80,80))
+            if qr_img is not None:
                 id_card.paste(qr_img,(300,100))
             st.image(id_card)
 
@@ -325,6 +521,7 @@ def logout():
 
 # ---------------- MAIN ----------------
 def main():
+    migrate_legacy_files()
     ensure_default_owner()
     if not st.session_state.logged_in:
         if st.session_state.page=="login":
@@ -3,45 +3,71 @@ import pandas as pd
 import pytz
 from datetime import datetime
 import json
+try:
+    import orjson
+except ImportError:  # optional speedup; fall back to the stdlib json module
+    orjson = None
 import hashlib
+import hmac
+import bcrypt
 
 # --- CONFIGURATION ---
 ATTENDANCE_FILE = 'attendance.csv'
 USERS_FILE = 'users.json'
 INDIA_TIMEZONE = pytz.timezone('Asia/Kolkata')
 PASSWORD_SALT = "a_unique_salt_for_your_app"
+ATTENDANCE_DTYPES = {'username': 'string', 'is_present': 'boolean'}
 
 # --- UTILITY FUNCTIONS ---
 def hash_password(password):
-    """Hashes a password with a salt for security."""
+    """Hashes a password with bcrypt and a per-user salt."""
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+
+def hash_legacy_password(password):
+    """The original salted SHA-256 hash, still accepted from accounts created before bcrypt."""
     return hashlib.sha256(str.encode(password + PASSWORD_SALT)).hexdigest()
 
+def is_legacy_hash(stored):
+    return not stored.startswith('$2')
+
+def verify_password(password, stored):
+    """Checks a typed password against a stored bcrypt or legacy SHA-256 hash."""
+    if is_legacy_hash(stored):
+        return hmac.compare_digest(stored, hash_legacy_password(password))
+    return bcrypt.checkpw(password.encode(), stored.encode())
+
 def load_data():
     """Loads user and attendance data, initializing if files don't exist."""
     # Initialize users.json
     try:
-        with open(USERS_FILE, 'r') as f:
-            users = json.load(f)
+        with open(USERS_FILE, 'rb') as f:
+            data = f.read()
+        # orjson.JSONDecodeError subclasses json.JSONDecodeError
+        users = orjson.loads(data) if orjson else json.loads(data)
     except (FileNotFoundError, json.JSONDecodeError):
         users = {
             'owner': {'password': hash_password('owner_password'), 'role': 'owner'}
         }
-        with open(USERS_FILE, 'w') as f:
-            json.dump(users, f)
+        save_user_data(users)
     
     # Initialize attendance.csv
     try:
-        attendance_df = pd.read_csv(ATTENDANCE_FILE, parse_dates=['date'])
+        # Typed columns and a fixed date format keep pandas on its fast C parsing path
+        attendance_df = pd.read_csv(ATTENDANCE_FILE, dtype=ATTENDANCE_DTYPES, parse_dates=['date'], date_format='%Y-%m-%d')
+        if not pd.api.types.is_datetime64_any_dtype(attendance_df['date']):
+            # Older files mix plain dates with midnight timestamps
+            attendance_df['date'] = pd.to_datetime(attendance_df['date'], format='mixed')
     except FileNotFoundError:
-        attendance_df = pd.DataFrame(columns=['username', 'date', 'check_in_time', 'is_present'])
+        attendance_df = pd.DataFrame(columns=['username', 'date', 'check_in_time', 'is_present']).astype({**ATTENDANCE_DTYPES, 'date': 'datetime64[ns]'})
         attendance_df.to_csv(ATTENDANCE_FILE, index=False)
     
     return users, attendance_df
 
 def save_user_data(users):
     """Saves user data back to the JSON file."""
-    with open(USERS_FILE, 'w') as f:
-        json.dump(users, f, indent=4)
+    data = orjson.dumps(users, option=orjson.OPT_INDENT_2) if orjson else json.dumps(users, indent=4).encode()
+    with open(USERS_FILE, 'wb') as f:
+        f.write(data)
 
 def save_attendance_data(df):
     """Saves attendance data back to the CSV file."""
@@ -71,7 +97,11 @@ def show_login_page():
         login_button = st.form_submit_button("Login")
         
     if login_button:
-        if username in users and users[username]['password'] == hash_password(password):
+        if username in users and verify_password(password, users[username]['password']):
+            if is_legacy_hash(users[username]['password']):
+                # Upgrade the stored hash now that we have the plain password
+                users[username]['password'] = hash_password(password)
+                save_user_data(users)
             st.session_state.authenticated = True
             st.session_state.username = username
             st.session_state.role = users[username]['role']
@@ -165,27 +195,28 @@ def show_mark_attendance_page():
                 mark_absent_button = st.form_submit_button("Mark Absent", type="secondary")
             
         if mark_present_button or mark_absent_button:
-            
-            # --- FIX FOR THE ATTRIBUTE ERROR ---
-            attendance_df['date'] = pd.to_datetime(attendance_df['date'])
-            # ------------------------------------
 
             now_ist = datetime.now(INDIA_TIMEZONE)
             current_date = now_ist.date()
             current_time = now_ist.time()
             
-            if ((attendance_df['username'] == selected_staff) & (attendance_df['date'].dt.date == current_date)).any():
+            # One vectorized pass over the columns; a range test covers dates stored with a time of day
+            today = pd.Timestamp(current_date)
+            marked = ((attendance_df['username'] == selected_staff)
+                      & (attendance_df['date'] >= today) & (attendance_df['date'] < today + pd.Timedelta(days=1)))
+            if marked.any():
                 st.warning(f"Attendance for '{selected_staff}' has already been marked for today.")
             else:
                 is_present = bool(mark_present_button)
-                new_record = pd.DataFrame([{
+                row = pd.DataFrame([{
                     'username': selected_staff,
-                    'date': current_date,
+                    'date': pd.Timestamp(current_date),
                     'check_in_time': current_time if is_present else None,
                     'is_present': is_present
                 }])
-                
-                attendance_df = pd.concat([attendance_df, new_record], ignore_index=True)
+                # Cast the typed columns so concat keeps 'string'/'boolean' (.loc enlargement would make them object/bool).
+                # check_in_time is left to concat: an all-absent file reads it as float64, which a time can't be cast to.
+                attendance_df = pd.concat([attendance_df, row.astype(ATTENDANCE_DTYPES)], ignore_index=True)
                 save_attendance_data(attendance_df)
                 
                 if is_present:
@@ -1,79 +1,312 @@
 import streamlit as st
 import pandas as pd
-import pytz
+import numpy as np
 from datetime import datetime, time
 import json
+try:
+    import orjson
+except ImportError:  # optional speedup; fall back to the stdlib json module
+    orjson = None
 import hashlib
+import hmac
 import os
+import bcrypt
 
 # --- CONFIGURATION ---
-ATTENDANCE_FILE = 'attendance.csv'
+ATTENDANCE_FILE = 'attendance.parquet'
+LEGACY_ATTENDANCE_FILE = 'attendance.csv'
+# Marks since the last compaction, appended one row at a time and replayed on load
+ATTENDANCE_JOURNAL_FILE = 'attendance_journal.csv'
+JOURNAL_COMPACT_BYTES = 64 * 1024
+# In-memory '09:05 AM' strings kept next to each time column for the dashboards; never saved
+DISPLAY_COLUMNS = {'check_in_time':'check_in_display', 'check_out_time':'check_out_display'}
 USERS_FILE = 'users.json'
-INDIA_TIMEZONE = pytz.timezone('Asia/Kolkata')
+try:
+    from zoneinfo import ZoneInfo
+    INDIA_TIMEZONE = ZoneInfo('Asia/Kolkata')
+except (ImportError, KeyError):  # no zoneinfo or no IANA tz database (Windows without tzdata)
+    import pytz
+    INDIA_TIMEZONE = pytz.timezone('Asia/Kolkata')
 PASSWORD_SALT = "a_unique_salt_for_your_app"
+# st.fragment is still experimental in streamlit 1.33
+fragment = getattr(st, "fragment", None) or st.experimental_fragment
 
 # --- UTILITY FUNCTIONS ---
 def hash_password(password: str) -> str:
+    """bcrypt hash with a per-user salt, stored inline in users.json."""
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+
+def hash_legacy_password(password: str) -> str:
+    """The original salted SHA-256 hash, still accepted from accounts created before bcrypt."""
     return hashlib.sha256(str.encode(password + PASSWORD_SALT)).hexdigest()
 
-def load_data():
-    """Load users and attendance, ensure owner exists."""
+def is_legacy_hash(stored: str) -> bool:
+    return not stored.startswith('$2')
+
+def verify_password(password: str, stored: str) -> bool:
+    """Check a typed password against a stored bcrypt or legacy SHA-256 hash."""
+    if is_legacy_hash(stored):
+        return hmac.compare_digest(stored, hash_legacy_password(password))
+    return bcrypt.checkpw(password.encode(), stored.encode())
+
+def verify_password_cached(password: str, stored: str) -> bool:
+    """verify_password memoized for this session, so resubmitting the same credentials skips bcrypt.
+    The key is an HMAC of the password under a per-session secret, so no plaintext is kept in session_state."""
+    if 'password_memo' not in st.session_state or len(st.session_state.password_memo) >= 128:
+        st.session_state.password_memo = {}
+    secret = st.session_state.setdefault('password_memo_secret', os.urandom(16))
+    key = (stored, hmac.digest(secret, password.encode(), 'sha256'))
+    memo = st.session_state.password_memo
+    if key not in memo:
+        memo[key] = verify_password(password, stored)
+    return memo[key]
+
+def _file_mtime(path):
+    """Modification time in ns, or None if the file doesn't exist."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_users(mtime):
+    """Load users.json. `mtime` keys the cache so reruns skip the disk until the file changes."""
     if os.path.exists(USERS_FILE):
         try:
-            with open(USERS_FILE,'r') as f:
-                users = json.load(f)
+            with open(USERS_FILE,'rb') as f:
+                data = f.read()
+            return orjson.loads(data) if orjson else json.loads(data)
         except:
-            users = {}
-    else:
-        users = {}
+            return {}
+    return {}
 
-    if 'owner' not in users:
-        users['owner'] = {'password': hash_password('owner_password'),'role':'owner'}
-        save_user_data(users)
+def empty_attendance() -> pd.DataFrame:
+    """An attendance frame with no rows, in the in-memory dtypes."""
+    return pd.DataFrame({
+        'username': pd.Series(dtype='category'),
+        'date': pd.Series(dtype='datetime64[ns]'),
+        'check_in_time': pd.Series(dtype='timedelta64[ns]'),
+        'check_out_time': pd.Series(dtype='timedelta64[ns]'),
+        'is_present': pd.Series(dtype=bool),
+    })
 
-    if os.path.exists(ATTENDANCE_FILE):
-        try:
-            attendance_df = pd.read_csv(ATTENDANCE_FILE, parse_dates=['date'], dayfirst=False)
-        except:
-            attendance_df = pd.DataFrame(columns=['username','date','check_in_time','check_out_time','is_present'])
-    else:
-        attendance_df = pd.DataFrame(columns=['username','date','check_in_time','check_out_time','is_present'])
-        save_attendance_data(attendance_df)
+def _time_of_day(values: pd.Series) -> pd.Series:
+    """Parse 'HH:MM:SS' (or full datetime) strings to a Timedelta since midnight; blanks become NaT."""
+    parsed = pd.to_datetime(values, errors='coerce')
+    return parsed - parsed.dt.normalize()
+
+def format_clock(times: pd.Series) -> pd.Series:
+    """'09:05 AM' style strings for a column of Timedeltas since midnight; NaT becomes ''."""
+    return (times + pd.Timestamp('1900-01-01')).dt.strftime('%I:%M %p').fillna('')
+
+def clock_text(td: pd.Timedelta) -> str:
+    """format_clock for a single value."""
+    return '' if pd.isna(td) else (pd.Timestamp('1900-01-01') + td).strftime('%I:%M %p')
 
+def _to_native(attendance_df: pd.DataFrame) -> pd.DataFrame:
+    """Converts columns read from older files to datetime64/timedelta64, once at load.
+    Columns already stored natively are left as they are."""
     # Ensure all required columns exist
     for col in ['check_out_time','check_in_time','is_present']:
         if col not in attendance_df.columns:
             attendance_df[col] = ""
 
-    attendance_df['date'] = pd.to_datetime(attendance_df['date'], errors='coerce')
+    # Few distinct names repeated on every row: categorical codes make the username filters int compares
+    attendance_df['username'] = attendance_df['username'].astype('category')
+    if not pd.api.types.is_bool_dtype(attendance_df['is_present']):
+        attendance_df['is_present'] = attendance_df['is_present'].astype(str).str.lower().isin(['true','1','yes'])
+    if not pd.api.types.is_datetime64_dtype(attendance_df['date']):
+        attendance_df['date'] = pd.to_datetime(attendance_df['date'], errors='coerce')
+    for col in ['check_in_time','check_out_time']:
+        if not pd.api.types.is_timedelta64_dtype(attendance_df[col]):
+            attendance_df[col] = _time_of_day(attendance_df[col])
+    return attendance_df
 
-    return users, attendance_df
+def load_legacy_attendance():
+    """Read the old attendance.csv, for the one-time move to Parquet."""
+    try:
+        return _to_native(pd.read_csv(LEGACY_ATTENDANCE_FILE, parse_dates=['date'], dayfirst=False))
+    except:
+        return empty_attendance()
 
-def save_user_data(users: dict):
-    with open(USERS_FILE,'w') as f:
-        json.dump(users,f,indent=4)
+def load_journal() -> pd.DataFrame:
+    """Marks appended since the last compaction, oldest first; None if there are none."""
+    if not os.path.exists(ATTENDANCE_JOURNAL_FILE):
+        return None
+    try:
+        journal = pd.read_csv(ATTENDANCE_JOURNAL_FILE, on_bad_lines='skip')
+    except:
+        return None
+    journal['date'] = pd.to_datetime(journal['date'], format='%Y-%m-%d', errors='coerce')
+    # A write cut short leaves a partial last row
+    journal = journal.dropna(subset=['username','date'])
+    for col in ['check_in_time','check_out_time']:
+        journal[col] = pd.to_timedelta(journal[col], errors='coerce')
+    journal['is_present'] = journal['is_present'].astype(str).str.lower().isin(['true','1','yes'])
+    return journal
 
-def save_attendance_data(df: pd.DataFrame):
-    df_copy = df.copy()
-    if 'date' in df_copy.columns:
-        df_copy['date'] = pd.to_datetime(df_copy['date'], errors='coerce').dt.strftime('%Y-%m-%d')
+def index_attendance(df: pd.DataFrame) -> dict:
+    """(username, day) -> label of that day's first row, so a mark finds its row with one dict lookup."""
+    keys = {}
+    for label, key in zip(df.index, zip(df['username'], df['date'].dt.normalize())):
+        keys.setdefault(key, label)
+    return keys
+
+def sort_attendance(df: pd.DataFrame):
+    """Sort df oldest-first in place, keeping row labels, so dashboards show it newest-first with a reversed slice."""
+    df.sort_values('date', kind='mergesort', na_position='first', inplace=True)
 
-    def _format_time(v):
-        if pd.isna(v) or v=="":
-            return ""
+def upsert_attendance(df: pd.DataFrame, keys: dict, record: dict) -> tuple:
+    """Apply one mark to df: update that day's row in place if there is one, else append a row.
+    Returns the frame (a new one after an append) and True when an existing row was updated."""
+    record = {**record, **{display: clock_text(record[col]) for col, display in DISPLAY_COLUMNS.items()}}
+    key = (record['username'], record['date'])
+    idx = keys.get(key)
+    if idx is not None:
+        for col in ['check_in_time','check_out_time','is_present', *DISPLAY_COLUMNS.values()]:
+            df.at[idx, col] = record[col]
+        return df, True
+    if record['username'] not in df['username'].cat.categories:
+        # A new staff member's first mark; the name must be a category before the row can keep the dtype
+        df['username'] = df['username'].cat.add_categories([record['username']])
+    # A one-row frame in df's own dtypes, so concat keeps the categorical and bool columns without a recast.
+    # Like .loc enlargement (a concat inside pandas), this still copies every column once.
+    idx = len(df)
+    row = pd.DataFrame({col: pd.Series([record[col]], index=[idx], dtype=df[col].dtype) for col in df.columns})
+    df = pd.concat([df, row])
+    keys[key] = idx
+    # New marks are usually for the latest day and land in order; only a backdated one needs a re-sort
+    if len(df) > 1 and record['date'] < df['date'].iat[-2]:
+        sort_attendance(df)
+    return df, False
+
+def apply_journal(df: pd.DataFrame, keys: dict, journal: pd.DataFrame) -> pd.DataFrame:
+    """Fold the journal into df in one pass; returns the new frame and adds new rows to keys.
+    The last mark per (username, day) wins: it updates that day's existing row or becomes a new row,
+    which is what replaying the marks one by one through upsert_attendance would leave."""
+    # Numbered by first appearance, so new rows get the labels a replay would have given them
+    first_seen = journal.groupby(['username','date'], sort=False).ngroup()
+    journal = journal.drop_duplicates(['username','date'], keep='last')
+    journal = journal.iloc[np.argsort(first_seen[journal.index].to_numpy(), kind='stable')]
+    for col, display in DISPLAY_COLUMNS.items():
+        journal[display] = format_clock(journal[col])
+    labels = [keys.get(key) for key in zip(journal['username'], journal['date'])]
+    hit = np.array([label is not None for label in labels], dtype=bool)
+    if hit.any():
+        rows = [label for label in labels if label is not None]
+        for col in ['check_in_time','check_out_time','is_present', *DISPLAY_COLUMNS.values()]:
+            df.loc[rows, col] = journal.loc[hit, col].to_numpy()
+    new = journal[~hit]
+    if new.empty:
+        return df
+    names = set(new['username']) - set(df['username'].cat.categories)
+    if names:
+        df['username'] = df['username'].cat.add_categories(sorted(names))
+    new = new[df.columns].astype(df.dtypes.to_dict()).set_axis(range(len(df), len(df) + len(new)))
+    keys.update(zip(zip(new['username'], new['date']), new.index))
+    return pd.concat([df, new])
+
+def _attendance_mtime():
+    return (_file_mtime(ATTENDANCE_FILE), _file_mtime(ATTENDANCE_JOURNAL_FILE))
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_attendance(mtime):
+    """Load attendance.parquet and replay the journal on top; returns the frame and its (username, day) index.
+    `mtime` covers both files and keys the cache like load_users."""
+    attendance_df = empty_attendance()
+    if os.path.exists(ATTENDANCE_FILE):
         try:
-            parsed = pd.to_datetime(v, errors='coerce')
-            if pd.isna(parsed):
-                return str(v)
-            return parsed.strftime('%H:%M:%S')
+            attendance_df = _to_native(pd.read_parquet(ATTENDANCE_FILE, engine='pyarrow'))
         except:
-            return str(v)
+            pass
+    # Format the times once here instead of on every dashboard render
+    for col, display in DISPLAY_COLUMNS.items():
+        attendance_df[display] = format_clock(attendance_df[col])
+    keys = index_attendance(attendance_df)
+    journal = load_journal()
+    if journal is not None and not journal.empty:
+        attendance_df = apply_journal(attendance_df, keys, journal)
+    sort_attendance(attendance_df)
+    return attendance_df, keys
 
-    for col in ['check_in_time','check_out_time']:
-        if col in df_copy.columns:
-            df_copy[col] = df_copy[col].apply(_format_time)
+def load_data():
+    """Load users and attendance, ensure owner exists.
+    Attendance and the staff set are kept in session_state and only rebuilt when their file changes on disk."""
+    users = load_users(_file_mtime(USERS_FILE))
+    if 'owner' not in users:
+        users['owner'] = {'password': hash_password('owner_password'),'role':'owner'}
+        save_user_data(users)
+    users_mtime = _file_mtime(USERS_FILE)
+    if st.session_state.get('users_mtime') != users_mtime or 'staff_set' not in st.session_state:
+        st.session_state.staff_set = {u for u,d in users.items() if d.get('role')=='staff'}
+        st.session_state.users_mtime = users_mtime
+
+    if not os.path.exists(ATTENDANCE_FILE):
+        if os.path.exists(LEGACY_ATTENDANCE_FILE):
+            save_attendance_data(load_legacy_attendance())
+        else:
+            save_attendance_data(empty_attendance())
+    mtime = _attendance_mtime()
+    if st.session_state.get('attendance_mtime') != mtime or 'attendance_df' not in st.session_state:
+        st.session_state.attendance_df, st.session_state.attendance_keys = load_attendance(mtime)
+        st.session_state.attendance_mtime = mtime
 
-    df_copy.to_csv(ATTENDANCE_FILE,index=False)
+    return users, st.session_state.attendance_df
+
+def save_user_data(users: dict):
+    data = orjson.dumps(users, option=orjson.OPT_INDENT_2) if orjson else json.dumps(users, indent=4).encode()
+    with open(USERS_FILE,'wb') as f:
+        f.write(data)
+    # Callers update staff_set themselves; don't rebuild it on the next rerun
+    st.session_state.users_mtime = _file_mtime(USERS_FILE)
+
+def save_attendance_data(df: pd.DataFrame):
+    # Dates and times are already datetime64/timedelta64, so they're written as-is
+    df.drop(columns=list(DISPLAY_COLUMNS.values()), errors='ignore').to_parquet(
+        ATTENDANCE_FILE, engine='pyarrow', compression='snappy', index=False)
+
+def journal_attendance(record: dict):
+    """Persist one mark by appending it to the journal instead of rewriting attendance.parquet.
+    Folds the journal into the Parquet file once it grows past JOURNAL_COMPACT_BYTES."""
+    new_file = not os.path.exists(ATTENDANCE_JOURNAL_FILE)
+    if not new_file:
+        with open(ATTENDANCE_JOURNAL_FILE,'rb+') as f:
+            # Start on a fresh line if the last write was cut short
+            f.seek(-1, os.SEEK_END)
+            if f.read(1)!=b'\n':
+                f.write(b'\n')
+    pd.DataFrame([record]).to_csv(ATTENDANCE_JOURNAL_FILE, mode='a', header=new_file, index=False)
+    if os.path.getsize(ATTENDANCE_JOURNAL_FILE) > JOURNAL_COMPACT_BYTES:
+        save_attendance_data(st.session_state.attendance_df)
+        os.remove(ATTENDANCE_JOURNAL_FILE)
+    # The session already holds this mark; don't reload attendance on the next rerun
+    st.session_state.attendance_mtime = _attendance_mtime()
+
+def present_status(is_present: pd.Series) -> np.ndarray:
+    """'Present'/'Absent' for the boolean is_present column."""
+    return np.where(is_present, 'Present', 'Absent')
+
+def attendance_display(df: pd.DataFrame, with_username: bool = True) -> pd.DataFrame:
+    """The dashboard table, built from df's formatted columns rather than a full copy of df."""
+    display_df = pd.DataFrame({
+        'date': df['date'].dt.strftime('%Y-%m-%d'),
+        'check_in_time': df['check_in_display'],
+        'check_out_time': df['check_out_display'],
+        'status': present_status(df['is_present']),
+    }, index=df.index)
+    if with_username:
+        display_df.insert(0, 'username', df['username'])
+    return display_df
+
+def user_rows(username: str):
+    """Row labels of username's attendance in date order, or None if there are none.
+    Grouped once per attendance change, so each staff render is a dict lookup instead of a full-frame mask."""
+    cached = st.session_state.get('rows_by_user')
+    if cached is None or cached[0] != st.session_state.attendance_mtime:
+        groups = st.session_state.attendance_df.groupby('username', observed=True, sort=False).groups
+        cached = (st.session_state.attendance_mtime, groups)
+        st.session_state.rows_by_user = cached
+    return cached[1].get(username)
 
 # --- INITIALIZATION ---
 users, attendance_df = load_data()
@@ -97,16 +330,23 @@ def show_login_page():
         password = st.text_input("Password", type="password")
         login_button = st.form_submit_button("Login")
     if login_button:
-        if username and username in users and users[username]['password']==hash_password(password):
+        # Unknown usernames bail out before any hashing
+        user=users.get(username)
+        if user and verify_password_cached(password, user['password']):
+            if is_legacy_hash(user['password']):
+                # Upgrade the stored hash now that we have the plain password
+                user['password']=hash_password(password)
+                save_user_data(users)
             st.session_state.authenticated=True
             st.session_state.username=username
-            st.session_state.role=users[username]['role']
+            st.session_state.role=user['role']
             st.session_state.page='owner_dashboard' if st.session_state.role=='owner' else 'staff_dashboard'
             st.rerun()
         else:
             st.error("Invalid username or password")
 
 # --- OWNER DASHBOARD ---
+@fragment
 def show_owner_dashboard():
     st.title(f"Welcome, {st.session_state.username.capitalize()} (Owner)")
     st.markdown("---")
@@ -132,39 +372,22 @@ def show_owner_dashboard():
     st.markdown("---")
     st.subheader("Full Attendance Sheet")
     if not attendance_df.empty:
-        display_df = attendance_df.copy()
-        display_df['date'] = pd.to_datetime(display_df['date'], errors='coerce').dt.strftime('%Y-%m-%d')
-
-        # Ensure check_in/out columns exist
-        for col in ['check_in_time','check_out_time']:
-            if col not in display_df.columns:
-                display_df[col] = ""
-        
-        # Format times safely
-        display_df['check_in_time'] = pd.to_datetime(display_df['check_in_time'], errors='coerce').dt.strftime('%I:%M %p').fillna('')
-        display_df['check_out_time'] = pd.to_datetime(display_df['check_out_time'], errors='coerce').dt.strftime('%I:%M %p').fillna('')
-        display_df['status'] = display_df['is_present'].apply(lambda x:'Present' if str(x).lower() in ('true','1','yes') or x is True else 'Absent')
-        st.dataframe(display_df[['username','date','check_in_time','check_out_time','status']].sort_values(by='date',ascending=False), use_container_width=True)
+        display_df = attendance_display(attendance_df.iloc[::-1])
+        st.dataframe(display_df, use_container_width=True)
     else:
         st.info("No attendance records found.")
 
 # --- STAFF DASHBOARD ---
+@fragment
 def show_staff_dashboard():
     st.title(f"Welcome, {st.session_state.username.capitalize()} (Staff)")
     st.markdown("---")
     st.subheader("Your Attendance History")
-    staff_attendance = attendance_df[attendance_df['username']==st.session_state.username]
-    if not staff_attendance.empty:
-        display_df = staff_attendance.copy()
-        display_df['date'] = pd.to_datetime(display_df['date'], errors='coerce').dt.strftime('%Y-%m-%d')
-
-        for col in ['check_in_time','check_out_time']:
-            if col not in display_df.columns:
-                display_df[col] = ""
-        display_df['check_in_time'] = pd.to_datetime(display_df['check_in_time'], errors='coerce').dt.strftime('%I:%M %p').fillna('')
-        display_df['check_out_time'] = pd.to_datetime(display_df['check_out_time'], errors='coerce').dt.strftime('%I:%M %p').fillna('')
-        display_df['status'] = display_df['is_present'].apply(lambda x:'Present' if str(x).lower() in ('true','1','yes') or x is True else 'Absent')
-        st.dataframe(display_df[['date','check_in_time','check_out_time','status']].sort_values(by='date',ascending=False), use_container_width=True)
+    labels = user_rows(st.session_state.username)
+    if labels is not None and len(labels):
+        staff_attendance = attendance_df.loc[labels]
+        display_df = attendance_display(staff_attendance.iloc[::-1], with_username=False)
+        st.dataframe(display_df, use_container_width=True)
     else:
         st.info("No attendance records found for you.")
 
@@ -186,6 +409,7 @@ def show_add_staff_page():
             st.error("Username already exists!")
         else:
             users[new_username]={'password':hash_password(new_password),'role':'staff'}
+            st.session_state.staff_set.add(new_username)
             save_user_data(users)
             st.success(f"Staff member '{new_username}' added successfully!")
             st.session_state.page='owner_dashboard'
@@ -197,13 +421,14 @@ def show_remove_staff_page():
     if st.button("Back to Dashboard"):
         st.session_state.page='owner_dashboard'
         st.rerun()
-    staff_members = [u for u,d in users.items() if d.get('role')=='staff']
+    staff_members = sorted(st.session_state.staff_set)
     if not staff_members:
         st.info("No staff members to remove.")
         return
     selected_staff = st.selectbox("Select Staff", staff_members)
     if st.button("Remove Staff"):
         del users[selected_staff]
+        st.session_state.staff_set.discard(selected_staff)
         save_user_data(users)
         st.success(f"Staff member '{selected_staff}' removed.")
         st.session_state.page='owner_dashboard'
@@ -215,7 +440,7 @@ def show_warning_page():
     if st.button("Back to Dashboard"):
         st.session_state.page='owner_dashboard'
         st.rerun()
-    staff_members=[u for u,d in users.items() if d.get('role')=='staff']
+    staff_members=sorted(st.session_state.staff_set)
     if not staff_members:
         st.info("No staff found.")
         return
@@ -229,46 +454,41 @@ def show_warning_page():
 
 # --- MARK/EDIT ATTENDANCE ---
 def show_mark_attendance_page():
-    global attendance_df
     st.title("Mark/Edit Attendance")
     if st.button("Back to Dashboard"):
         st.session_state.page='owner_dashboard'
         st.rerun()
-    staff_members=[u for u,d in users.items() if d.get('role')=='staff']
+    staff_members=sorted(st.session_state.staff_set)
     if not staff_members:
         st.warning("No staff members to mark attendance.")
         return
+    # One clock read for all three defaults. Whole minutes keep the defaults, and so the widget ids,
+    # the same on the submit rerun; a default that changed would drop the times the owner picked.
+    now=datetime.now(INDIA_TIMEZONE).replace(second=0, microsecond=0)
     with st.form(key='mark_attendance_form'):
         selected_staff=st.selectbox("Select Staff", staff_members)
-        selected_date=st.date_input("Select Date", value=datetime.now(INDIA_TIMEZONE).date())
-        check_in_time=st.time_input("Check-in Time", value=datetime.now(INDIA_TIMEZONE).time())
-        check_out_time=st.time_input("Check-out Time", value=datetime.now(INDIA_TIMEZONE).time())
+        selected_date=st.date_input("Select Date", value=now.date())
+        check_in_time=st.time_input("Check-in Time", value=now.time())
+        check_out_time=st.time_input("Check-out Time", value=now.time())
         is_present=st.checkbox("Present", value=True)
         submit_button=st.form_submit_button("Submit Attendance")
     if submit_button:
         selected_date_dt=pd.to_datetime(selected_date)
-        check_in_str=check_in_time.strftime("%H:%M:%S")
-        check_out_str=check_out_time.strftime("%H:%M:%S")
-        mask_user=attendance_df['username']==selected_staff
-        mask_date=attendance_df['date'].dt.date==selected_date
-        existing_index=attendance_df[mask_user & mask_date].index
-        if existing_index.any():
-            idx=existing_index[0]
-            attendance_df.at[idx,'check_in_time']=check_in_str
-            attendance_df.at[idx,'check_out_time']=check_out_str
-            attendance_df.at[idx,'is_present']=is_present
+        check_in_td=pd.Timedelta(hours=check_in_time.hour, minutes=check_in_time.minute, seconds=check_in_time.second)
+        check_out_td=pd.Timedelta(hours=check_out_time.hour, minutes=check_out_time.minute, seconds=check_out_time.second)
+        record={
+            'username':selected_staff,
+            'date':selected_date_dt,
+            'check_in_time':check_in_td,
+            'check_out_time':check_out_td,
+            'is_present':is_present
+        }
+        st.session_state.attendance_df, updated = upsert_attendance(attendance_df, st.session_state.attendance_keys, record)
+        if updated:
             st.success(f"Attendance updated for '{selected_staff}' on {selected_date}")
         else:
-            new_record=pd.DataFrame([{
-                'username':selected_staff,
-                'date':selected_date_dt,
-                'check_in_time':check_in_str,
-                'check_out_time':check_out_str,
-                'is_present':is_present
-            }])
-            attendance_df=pd.concat([attendance_df,new_record],ignore_index=True)
             st.success(f"Attendance marked for '{selected_staff}' on {selected_date}")
-        save_attendance_data(attendance_df)
+        journal_attendance(record)
         st.session_state.page='owner_dashboard'
         st.rerun()
 
@@ -285,18 +505,28 @@ def show_logout_button():
         perform_logout()
 
 # --- NAVIGATION ---
+# Sidebar label -> page, per role
+NAV_PAGES = {
+    'owner': {'Dashboard':'owner_dashboard','Add Staff':'add_staff','Mark Attendance':'mark_attendance',
+              'Remove Staff':'remove_staff','Warnings':'warnings'},
+    'staff': {'My Attendance':'staff_dashboard'},
+}
+
 if not st.session_state.authenticated:
     show_login_page()
 else:
     st.sidebar.title("Navigation")
-    if st.session_state.role=='owner':
-        if st.sidebar.button("Dashboard"): st.session_state.page='owner_dashboard'; st.rerun()
-        if st.sidebar.button("Add Staff"): st.session_state.page='add_staff'; st.rerun()
-        if st.sidebar.button("Mark Attendance"): st.session_state.page='mark_attendance'; st.rerun()
-        if st.sidebar.button("Remove Staff"): st.session_state.page='remove_staff'; st.rerun()
-        if st.sidebar.button("Warnings"): st.session_state.page='warnings'; st.rerun()
-    else:
-        if st.sidebar.button("My Attendance"): st.session_state.page='staff_dashboard'; st.rerun()
+    # One radio instead of a button per page: a click is a single widget change and the page renders in the same run
+    nav=NAV_PAGES.get(st.session_state.role, {})
+    if nav:
+        # Follow page changes made by the dashboard and "Back" buttons, and drop a value left over from the
+        # other role's options. The value goes through the radio's key, not index=, so its widget id
+        # (and a click on it) survives the change.
+        label=next((k for k,v in nav.items() if v==st.session_state.page), None)
+        if label or st.session_state.get('nav_page') not in nav:
+            st.session_state.nav_page=label or next(iter(nav))
+        st.sidebar.radio("Navigate", list(nav), key='nav_page',
+                         on_change=lambda: st.session_state.update(page=nav[st.session_state.nav_page]))
     st.sidebar.markdown("---")
     show_logout_button()
 